@@ -1,309 +1,795 @@
-import sqlite3
-import os
-import math
-import time
-import pandas as pd
-import numpy as np
-import multiprocessing as mp
-
-
-def merge_profile(profile):
-    '''
-    Collates ground motions and merges into one Excel file per profile
-    '''
-    cwd = os.path.abspath('./data/input_files/' + profile)
-    folders = [f for f in os.listdir(cwd) if f.startswith('Motion_')]
-
-    df_surface = pd.DataFrame()
-    df_input = pd.DataFrame()
-    df_disp = pd.DataFrame()
-    df_strain = pd.DataFrame()
-    df_stress = pd.DataFrame()
-
-    for folder in folders:
-        motion = folder[len("Motion_"):]
-        conn = sqlite3.connect('./data/input_files/' + profile + '/' +
-                               folder + '/deepsoilout.db3')
-
-        # Input Motion
-        df_next_input = pd.read_sql_query(
-            'SELECT PERIOD, INPUT_MOTION_RS FROM RESPONSE_SPECTRA', conn)
-        df_next_input = df_next_input.rename(columns={
-            'INPUT_MOTION_RS': motion
-        }).set_index('PERIOD')
-        df_input = df_next_input.join(df_input)
-
-        # Surface Motion
-        df_next_surf = pd.read_sql_query(
-            'SELECT PERIOD, LAYER1_RS FROM RESPONSE_SPECTRA', conn)
-        df_next_surf = df_next_surf.rename(columns={
-            'LAYER1_RS': motion
-        }).set_index('PERIOD')
-        df_surface = df_next_surf.join(df_surface)
-
-        # Displacement
-        df_next_disp = pd.read_sql_query(
-            'SELECT DEPTH_LAYER_TOP, MIN_DISP_RELATIVE, MAX_DISP_RELATIVE FROM PROFILES',
-            conn)
-        df_next_disp = df_next_disp.abs()
-        df_next_disp[motion] = df_next_disp[[
-            'MIN_DISP_RELATIVE', 'MAX_DISP_RELATIVE'
-        ]].max(axis=1)
-
-        df_next_disp = df_next_disp.drop(
-            columns=['MIN_DISP_RELATIVE', 'MAX_DISP_RELATIVE']).set_index(
-                'DEPTH_LAYER_TOP')
-        df_disp = df_next_disp.join(df_disp)
-
-        # Strain (%)
-        df_next_strain = pd.read_sql_query(
-            'SELECT DEPTH_LAYER_MID, MAX_STRAIN FROM PROFILES', conn)
-        df_next_strain = df_next_strain.rename(columns={
-            'MAX_STRAIN': motion
-        }).set_index('DEPTH_LAYER_MID')
-        df_strain = df_next_strain.join(df_strain)
-
-        # Stress Ratio
-        df_next_stress = pd.read_sql_query(
-            'SELECT DEPTH_LAYER_MID, MAX_STRESS_RATIO FROM PROFILES', conn)
-        df_next_stress = df_next_stress.rename(columns={
-            'MAX_STRESS_RATIO': motion
-        }).set_index('DEPTH_LAYER_MID')
-        df_stress = df_next_stress.join(df_stress)
-
-    df_input = df_input.reindex(sorted(df_input.columns), axis=1)
-    df_input_mean = df_input.groupby(df_input.columns.str[:2],
-                                     axis=1).prod().pow(0.5)
-
-    n_suite = len(df_input_mean.columns)
-
-    # Input Mean
-    df_input['Mean'] = df_input.prod(axis=1).pow(0.5 / n_suite)
-    df_input_mean['Mean'] = df_input_mean.prod(axis=1).pow(1. / n_suite)
-
-    # Surface Mean
-    df_surface = df_surface.reindex(sorted(df_surface.columns), axis=1)
-    df_surface_mean = df_surface.groupby(df_surface.columns.str[:2],
-                                         axis=1).prod().pow(0.5)
-    df_surface['Mean'] = df_surface.prod(axis=1).pow(0.5 / n_suite)
-    df_surface_mean['Mean'] = df_surface_mean.prod(axis=1).pow(1. / n_suite)
-
-    # Amplification Mean
-    df_ampl = df_surface_mean.iloc[:, :-1] / df_input_mean.iloc[:, :-1]
-    df_ampl_xim = df_surface_mean.iloc[:, :-1] / df_input_mean.iloc[0][:-1]
-    df_ampl['Mean'] = df_ampl.prod(axis=1).pow(1. / n_suite)
-    df_ampl_xim['Mean'] = df_ampl_xim.prod(axis=1).pow(1. / n_suite)
-
-    # Displacement Mean
-    df_disp = df_disp.reindex(sorted(df_disp.columns), axis=1)
-    df_disp['Mean'] = df_disp.mean(axis=1)
-
-    # Strain Mean
-    df_strain = df_strain.reindex(sorted(df_strain.columns), axis=1)
-    df_strain['Mean'] = df_strain.mean(axis=1)
-
-    # Stress Ratio Mean
-    df_stress = df_stress.reindex(sorted(df_stress.columns), axis=1)
-    df_stress['Mean'] = df_stress.mean(axis=1)
-
-    # Write RS to Excel
-    writer_SRA = pd.ExcelWriter('./data/output_files/' + profile + '/' +
-                                profile + '_RS.xlsx')
-    df_input.to_excel(writer_SRA, 'Input Motion')
-    df_input_mean.to_excel(writer_SRA, 'Input GeoMean Spectra')
-    df_surface.to_excel(writer_SRA, 'Surface Motion')
-    df_surface_mean.to_excel(writer_SRA, 'Surface GeoMean Spectra')
-    df_ampl.to_excel(writer_SRA, 'Amplification Spectra')
-    df_ampl_xim.to_excel(writer_SRA, 'Amplification x_IM,ref')
-    writer_SRA.save()
-
-    # Write Profile to Excel
-    writer_Profile = pd.ExcelWriter('./data/output_files/' + profile + '/' +
-                                    profile + '_Profile.xlsx')
-    df_disp.to_excel(writer_Profile, 'Displacement')
-    df_strain.to_excel(writer_Profile, 'Strain')
-    df_stress.to_excel(writer_Profile, 'Stress Ratio')
-    writer_Profile.save()
-
-
-def df_next_comb(xlsx, df, sheet_name, mean_col):
-    '''
-    Appends spectral mean of profile to dataframe 
-    '''
-    df_next = pd.read_excel(xlsx,
-                            sheet_name=sheet_name).rename(columns={
-                                'Mean': mean_col,
-                            })
-    df = df_next[['PERIOD', mean_col]].set_index('PERIOD').join(df)
-    return df
-
-
-def main():
-    start_time = time.perf_counter()
-    cwd = os.path.abspath('./data/input_files/')
-    profiles = os.listdir(cwd)
-    profiles = [f for f in profiles if f.startswith('profile_')]
-
-    # output folder and subfolders created if does not exist
-    if not os.path.exists('./data/output_files/'):
-        os.mkdir('./data/output_files/')
-    for profile in profiles:
-        if not os.path.exists('./data/output_files/' + profile):
-            os.mkdir('./data/output_files/' + profile)
-
-    with mp.Pool() as pool:
-        pool.map(merge_profile, profiles)
-
-    df_surf_comb = pd.DataFrame()
-    df_ampl_comb = pd.DataFrame()
-    df_ampl_xim_comb = pd.DataFrame()
-    df_disp_comb = pd.DataFrame()
-    df_strain_comb = pd.DataFrame()
-    df_stress_comb = pd.DataFrame()
-    df_surf_GM = pd.DataFrame()
-    df_ampl_GM = pd.DataFrame()
-    df_ampl_xim_GM = pd.DataFrame()
-    pd.options.mode.use_inf_as_na = True
-
-    for profile in reversed(profiles):
-        mean_col = 'Mean ' + profile[8:]
-
-        # Compile RS
-        xlsx_RS = pd.ExcelFile('./data/output_files/' + profile + '/' +
-                               profile + '_RS.xlsx')
-        df_surf_comb = df_next_comb(xlsx_RS, df_surf_comb,
-                                'Surface GeoMean Spectra', mean_col)
-        df_ampl_comb = df_next_comb(xlsx_RS, df_ampl_comb,
-                                'Amplification Spectra', mean_col)
-        df_ampl_xim_comb = df_next_comb(xlsx_RS, df_ampl_xim_comb,
-                                'Amplification x_IM,ref', mean_col)
-        if df_surf_GM.empty:
-            df_surf_mtn_GM = pd.read_excel(xlsx_RS,
-                            sheet_name='Surface Motion', index_col=0)
-            df_surf_GM = pd.read_excel(xlsx_RS,
-                            sheet_name='Surface GeoMean Spectra', index_col=0)
-            df_ampl_GM = pd.read_excel(xlsx_RS,
-                            sheet_name='Amplification Spectra', index_col=0)
-            df_ampl_xim_GM = pd.read_excel(xlsx_RS,
-                            sheet_name='Amplification x_IM,ref', index_col=0)
-        else:
-            df_surf_mtn_GM = df_surf_mtn_GM.mul(pd.read_excel(
-                xlsx_RS, sheet_name='Surface Motion', index_col=0),
-                                        fill_value=1)
-            df_surf_GM = df_surf_GM.mul(pd.read_excel(
-                xlsx_RS, sheet_name='Surface GeoMean Spectra', index_col=0),
-                                        fill_value=1)
-            df_ampl_GM = df_ampl_GM.mul(pd.read_excel(
-                xlsx_RS, sheet_name='Amplification Spectra', index_col=0),
-                                        fill_value=1)
-            df_ampl_xim_GM = df_ampl_xim_GM.mul(pd.read_excel(
-                xlsx_RS, sheet_name='Amplification x_IM,ref', index_col=0),
-                                        fill_value=1)
-
-        # Compile Profile
-        xlsx_PF = pd.ExcelFile('./data/output_files/' + profile + '/' +
-                               profile + '_Profile.xlsx')
-
-        # Compile Strain Tab
-        df_next_strain_comb = pd.read_excel(xlsx_PF, sheet_name='Strain')
-        df_next_strain_comb = df_next_strain_comb[[
-            'DEPTH_LAYER_MID', 'Mean'
-        ]].rename(columns={
-            'DEPTH_LAYER_MID': 'Depth',
-            'Mean': mean_col
-        })
-        max_depth = math.ceil(df_next_strain_comb['Depth'].iloc[-1])
-        df_depths = pd.DataFrame(np.arange(0.5, max_depth, 1),
-                                 columns=['Depth'])
-        df_next_strain_comb = pd.merge_asof(df_depths,
-                                            df_next_strain_comb,
-                                            on='Depth')
-        df_strain_comb = df_next_strain_comb.set_index('Depth').join(
-            df_strain_comb)
-
-        # Compile Stress Ratio Tab
-        df_next_stress_comb = pd.read_excel(xlsx_PF, sheet_name='Stress Ratio')
-        df_next_stress_comb = df_next_stress_comb[[
-            'DEPTH_LAYER_MID', 'Mean'
-        ]].rename(columns={
-            'DEPTH_LAYER_MID': 'Depth',
-            'Mean': mean_col
-        })
-        df_next_stress_comb = pd.merge_asof(df_depths,
-                                            df_next_stress_comb,
-                                            on='Depth')
-        df_stress_comb = df_next_stress_comb.set_index('Depth').join(
-            df_stress_comb)
-
-        # Compile Displacement Tab
-        df_next_disp_comb = pd.read_excel(xlsx_PF, sheet_name='Displacement')
-        df_next_disp_comb = df_next_disp_comb[['DEPTH_LAYER_TOP', 'Mean'
-                                               ]].rename(columns={
-                                                   'DEPTH_LAYER_TOP': 'Depth',
-                                                   'Mean': mean_col
-                                               })
-        df_next_disp_comb = pd.merge_asof(df_depths,
-                                          df_next_disp_comb,
-                                          on='Depth')
-        df_disp_comb = df_next_disp_comb.set_index('Depth').join(df_disp_comb)
-
-    # Sort Profiles
-    profile_order = [int(profile[8:]) for profile in profiles]
-    zipped = zip(profile_order, df_surf_comb.columns)
-    sorted_zipped_lists = sorted(zipped)
-    sorted_cols = [element for _, element in sorted_zipped_lists]
-
-    df_surf_comb = df_surf_comb.reindex(sorted_cols, axis=1)
-    df_ampl_comb = df_ampl_comb.reindex(sorted_cols, axis=1)
-    df_ampl_xim_comb = df_ampl_xim_comb.reindex(sorted_cols, axis=1)
-    df_disp_comb = df_disp_comb.reindex(sorted_cols, axis=1)
-    df_strain_comb = df_strain_comb.reindex(sorted_cols, axis=1)
-    df_stress_comb = df_stress_comb.reindex(sorted_cols, axis=1)
-
-    # RS Geomean for batch run
-    n_valid_profiles = df_surf_comb.count(axis=1)
-    df_surf_comb['Sa (g)'] = df_surf_comb.prod(axis=1).pow(
-        1. / n_valid_profiles)
-    df_ampl_comb['Sa (g)'] = df_ampl_comb.prod(axis=1).pow(
-        1. / n_valid_profiles)
-    df_ampl_xim_comb['Sa (g)'] = df_ampl_xim_comb.prod(axis=1).pow(
-        1. / n_valid_profiles)
-    df_surf_mtn_GM = df_surf_mtn_GM.pow(1. / n_valid_profiles.mean())
-    df_surf_GM = df_surf_GM.pow(1. / n_valid_profiles.mean())
-    df_ampl_GM = df_ampl_GM.pow(1. / n_valid_profiles.mean())
-    df_ampl_xim_GM = df_ampl_xim_GM.pow(1. / n_valid_profiles.mean())
-
-    # Write RS_Merged
-    writer_Merged_RS = pd.ExcelWriter('./data/output_files/RS_Merged.xlsx')
-    df_surf_comb.to_excel(writer_Merged_RS, 'Surface GM Spectra')
-    df_ampl_comb.to_excel(writer_Merged_RS, 'Amplification Spectra')
-    df_ampl_xim_comb.to_excel(writer_Merged_RS, 'Amplification x_IM,ref')
-    writer_Merged_RS.save()
-
-    # Write GMs_Merged
-    writer_Merged_GMs = pd.ExcelWriter('./data/output_files/GMs_Merged.xlsx')
-    df_surf_mtn_GM.to_excel(writer_Merged_GMs, 'Surface Motion')
-    df_surf_GM.to_excel(writer_Merged_GMs, 'Surface GeoMean Spectra')
-    df_ampl_GM.to_excel(writer_Merged_GMs, 'Amplification Spectra')
-    df_ampl_xim_GM.to_excel(writer_Merged_GMs, 'Amplification x_IM,ref')
-    writer_Merged_GMs.save()
-
-    # Write Profile_Merged
-    writer_Merged_Prof = pd.ExcelWriter(
-        './data/output_files/Profile_Merged.xlsx')
-    df_disp_comb.to_excel(writer_Merged_Prof, 'Displacement')
-    df_strain_comb.to_excel(writer_Merged_Prof, 'Strain')
-    df_stress_comb.to_excel(writer_Merged_Prof, 'Stress Ratio')
-    writer_Merged_Prof.save()
-
-    end_time = time.perf_counter()
-    # Log run statistics
-    print(  f"Program ran successfully. "
-            f"Finished in {(end_time - start_time): .2f} seconds.")
-
-    input("Press ENTER to exit...")
-
-
-if __name__ == '__main__':
-    mp.freeze_support()
-    main()
+import os
+import argparse
+import warnings
+import time
+import pandas as pd
+import numpy as np
+import multiprocessing as mp
+from deepsoil_reader import read_motion_db
+import results_store as rs
+import compile_cache as cc
+import depth_resample as dr
+from geomean import nan_geomean, nan_geomean_reduceat
+from running_stats import RunningLogMean, RunningMean, Reservoir
+
+
+PROFILE_QUANTITIES = ('Displacement', 'Strain', 'Stress Ratio')
+
+
+def _nl_motion(folder):
+    '''
+    Motion name of a nonlinear run, e.g. '01 FN (5%)'
+    '''
+    return folder[len("Motion_"):]
+
+
+def _el_motion(folder):
+    '''
+    Motion name of an equivalent-linear run, e.g. '01 FN'
+    '''
+    pos = folder.find('(') - 1
+    return folder[7:pos]
+
+
+# Nonlinear (NL) and equivalent-linear (EL) result sets are compiled by the
+# same engine from a single walk of the input tree
+ANALYSES = {'NL': {'db': 'deepsoilout.db3',
+                   'motion': _nl_motion,
+                   'output_dir': './data/output_files/',
+                   'store_dir': './data/results_store/',
+                   'gm_sheet': 'GeoMean Spectra'},
+            'EL': {'db': 'deepsoilout_el.db3',
+                   'motion': _el_motion,
+                   'output_dir': './data/output_files_el/',
+                   'store_dir': './data/results_store_el/',
+                   'gm_sheet': 'GM Spectra'}}
+
+
+def discover_profiles(input_dir):
+    '''
+    Walks the input folder tree once and returns, for every analysis type,
+    the motion folders of each profile holding its database, ordered by
+    profile number and motion name
+    '''
+    profiles = sorted([f for f in os.listdir(input_dir)
+                       if f.startswith('profile_')], key=lambda f: int(f[8:]))
+    tree = {analysis: {} for analysis in ANALYSES}
+    for profile in profiles:
+        profile_dir = os.path.join(input_dir, profile)
+        for folder in sorted([f for f in os.listdir(profile_dir)
+                              if f.startswith('Motion_')]):
+            files = os.listdir(os.path.join(profile_dir, folder))
+            for analysis, spec in ANALYSES.items():
+                if spec['db'] in files:
+                    tree[analysis].setdefault(profile, []).append(folder)
+    return tree
+
+
+def _db_path(profile, folder, analysis):
+    '''
+    Returns the path to the DEEPSOIL output database of a motion
+    '''
+    return './data/input_files/' + profile + '/' + folder + '/' + \
+        ANALYSES[analysis]['db']
+
+
+def _stored_record(stored, motion):
+    '''
+    Rebuilds the per-motion record of a motion kept in a stored profile
+    '''
+    iloc = stored['Motions'].index(motion)
+    record = {key: stored[key] for key in ('Period', 'Depth Top', 'Depth Mid')}
+    for key in ('Input', 'Surface') + PROFILE_QUANTITIES:
+        record[key] = stored[key][iloc]
+    return record
+
+
+def extract_profile(profile, folders, analysis='NL', cached=None):
+    '''
+    Reads every motion database of a profile into (motion x period) and
+    (motion x layer) arrays, allocated once and filled in place
+    :param str analysis:
+        Analysis type of the databases, key of ANALYSES
+    :param dict cached:
+        Per-motion records keyed by folder, used instead of reading the
+        database of those motions
+    '''
+    cached = cached or {}
+    cube = {'Motions': [ANALYSES[analysis]['motion'](folder)
+                        for folder in folders]}
+    n_motions = len(folders)
+
+    for iloc, folder in enumerate(folders):
+        if folder in cached:
+            record = cached[folder]
+        else:
+            record = read_motion_db(_db_path(profile, folder, analysis))
+        if iloc == 0:
+            # motions of a profile share its periods and layering
+            for key in ('Period', 'Depth Top', 'Depth Mid'):
+                cube[key] = record[key]
+            for key in ('Input', 'Surface') + PROFILE_QUANTITIES:
+                cube[key] = np.empty([n_motions, len(record[key])],
+                                     dtype=float)
+        for key in ('Input', 'Surface') + PROFILE_QUANTITIES:
+            if len(record[key]) != cube[key].shape[1]:
+                raise ValueError(f"{folder} in {profile} does not share the "
+                                 f"periods/layers of the other motions!")
+            cube[key][iloc, :] = record[key]
+    return cube
+
+
+def profile_means(cube):
+    '''
+    Computes the spectral geometric means and profile arithmetic means of a
+    profile by vectorized reductions along the motion axis
+    '''
+    # motions are sorted, so components of a pair are adjacent
+    labels = [motion[:2] for motion in cube['Motions']]
+    starts = [iloc for iloc, label in enumerate(labels)
+              if iloc == 0 or label != labels[iloc - 1]]
+    pairs = [labels[iloc] for iloc in starts]
+
+    means = {'Pairs': pairs}
+    for key in ('Input', 'Surface'):
+        means[key + ' Mean'] = nan_geomean(cube[key])
+        pair_gm = nan_geomean_reduceat(cube[key], starts)
+        means[key + ' GeoMean'] = pair_gm
+        means[key + ' GeoMean Mean'] = nan_geomean(pair_gm)
+
+    ampl = means['Surface GeoMean'] / means['Input GeoMean']
+    ampl_xim = means['Surface GeoMean'] / means['Input GeoMean'][:, :1]
+    means['Amplification'] = ampl
+    means['Amplification Mean'] = nan_geomean(ampl)
+    means['Amplification x_IM,ref'] = ampl_xim
+    means['Amplification x_IM,ref Mean'] = nan_geomean(ampl_xim)
+
+    for key in PROFILE_QUANTITIES:
+        means[key + ' Mean'] = np.nanmean(cube[key], axis=0)
+    return means
+
+
+def _to_frame(values, index, columns, mean):
+    '''
+    Builds a sheet with one column per motion/pair and a trailing Mean
+    '''
+    df = pd.DataFrame(values.T, index=index, columns=columns)
+    df['Mean'] = mean
+    return df
+
+
+def merge_profile(profile, jobs):
+    '''
+    Collates the ground motions of a profile for every analysis type in one
+    pass and returns their arrays and means to the parent process, along with
+    the manifest entries of their databases. Only databases whose content
+    changed since the given manifest entries are read again; the others are
+    taken from the results store.
+    :param dict jobs:
+        (motion folders, previous manifest entries) keyed by analysis type
+    '''
+    compiled = {}
+    for analysis, (folders, entries) in jobs.items():
+        store_dir = ANALYSES[analysis]['store_dir']
+        entries = entries or {}
+        stored = None
+        if entries and os.path.exists(rs.profile_archive(store_dir, profile)):
+            with rs.load_profile(store_dir, profile) as archive:
+                stored = dict(archive)
+
+        manifest, cached = {}, {}
+        for folder in folders:
+            manifest[folder], changed = cc.fingerprint(
+                _db_path(profile, folder, analysis), entries.get(folder))
+            motion = ANALYSES[analysis]['motion'](folder)
+            if not changed and stored is not None and \
+                    motion in stored['Motions']:
+                cached[folder] = _stored_record(stored, motion)
+
+        result = extract_profile(profile, folders, analysis, cached)
+        result.update(profile_means(result))
+        compiled[analysis] = (result, manifest)
+    return compiled
+
+
+def profile_workbooks(profile, analysis='NL'):
+    '''
+    Returns the paths of the RS and Profile workbooks of a profile
+    '''
+    output_dir = ANALYSES[analysis]['output_dir'] + profile + '/'
+    return (output_dir + profile + '_RS.xlsx',
+            output_dir + profile + '_Profile.xlsx')
+
+
+def write_profile_excel(profile, result, analysis='NL'):
+    '''
+    Exports the collated motions of a profile to its RS and Profile workbooks
+    '''
+    output_dir = ANALYSES[analysis]['output_dir'] + profile + '/'
+    rs_file, profile_file = profile_workbooks(profile, analysis)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    gm_sheet = ANALYSES[analysis]['gm_sheet']
+    period = pd.Index(result['Period'], name='PERIOD')
+    motions, pairs = result['Motions'], result['Pairs']
+    df_input = _to_frame(result['Input'], period, motions,
+                         result['Input Mean'])
+    df_input_mean = _to_frame(result['Input GeoMean'], period, pairs,
+                              result['Input GeoMean Mean'])
+    df_surface = _to_frame(result['Surface'], period, motions,
+                           result['Surface Mean'])
+    df_surface_mean = _to_frame(result['Surface GeoMean'], period, pairs,
+                                result['Surface GeoMean Mean'])
+    df_ampl = _to_frame(result['Amplification'], period, pairs,
+                        result['Amplification Mean'])
+    df_ampl_xim = _to_frame(result['Amplification x_IM,ref'], period, pairs,
+                            result['Amplification x_IM,ref Mean'])
+
+    depth_top = pd.Index(result['Depth Top'], name='DEPTH_LAYER_TOP')
+    depth_mid = pd.Index(result['Depth Mid'], name='DEPTH_LAYER_MID')
+    df_disp = _to_frame(result['Displacement'], depth_top, motions,
+                        result['Displacement Mean'])
+    df_strain = _to_frame(result['Strain'], depth_mid, motions,
+                          result['Strain Mean'])
+    df_stress = _to_frame(result['Stress Ratio'], depth_mid, motions,
+                          result['Stress Ratio Mean'])
+
+    # Write RS to Excel
+    writer_SRA = pd.ExcelWriter(rs_file)
+    df_input.to_excel(writer_SRA, 'Input Motion')
+    df_input_mean.to_excel(writer_SRA, 'Input ' + gm_sheet)
+    df_surface.to_excel(writer_SRA, 'Surface Motion')
+    df_surface_mean.to_excel(writer_SRA, 'Surface ' + gm_sheet)
+    df_ampl.to_excel(writer_SRA, 'Amplification Spectra')
+    df_ampl_xim.to_excel(writer_SRA, 'Amplification x_IM,ref')
+    writer_SRA.save()
+
+    # Write Profile to Excel
+    writer_Profile = pd.ExcelWriter(profile_file)
+    df_disp.to_excel(writer_Profile, 'Displacement')
+    df_strain.to_excel(writer_Profile, 'Strain')
+    df_stress.to_excel(writer_Profile, 'Stress Ratio')
+    writer_Profile.save()
+
+
+# Per-motion/pair spectra carried into the batch geometric means
+BATCH_SPECTRA = ('Surface', 'Surface GeoMean', 'Amplification',
+                 'Amplification x_IM,ref')
+
+
+def _batch_rows(result, key, motions, pairs):
+    '''
+    Aligns the per-motion/pair spectra of a profile and their mean on the
+    batch columns
+    '''
+    labels = motions if key == 'Surface' else pairs
+    own = result['Motions'] if key == 'Surface' else result['Pairs']
+    values = np.full([len(labels) + 1, len(result['Period'])], np.nan)
+    cols = [labels.index(label) for label in own] + [len(labels)]
+    values[cols, :] = np.vstack([result[key], result[key + ' Mean']])
+    # infinite ordinates are treated as missing in the batch means
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def _depth_grid(result, depth_step=1.0, max_depth=None):
+    '''
+    Returns the depth grid of the batch; by default spanning the layers of
+    the given (first) profile
+    '''
+    if max_depth is None:
+        max_depth = dr.profile_depth(result['Depth Mid'])
+    return dr.depth_grid(max_depth, depth_step)
+
+
+def _resample_means(results, depths, interpolation='step'):
+    '''
+    Resamples the profile means of several profiles on the batch depth grid
+    in one pass per quantity; depths beyond the grid of each profile itself
+    are left empty
+    :returns:
+        Dictionary of (profile x depth) arrays keyed by quantity
+    '''
+    max_depths = [dr.profile_depth(result['Depth Mid']) for result in results]
+    resampled = {}
+    for key in PROFILE_QUANTITIES:
+        depth_col = 'Depth Top' if key == 'Displacement' else 'Depth Mid'
+        resampled[key] = dr.resample(
+            dr.stack_layers([result[depth_col] for result in results]),
+            dr.stack_layers([result[key + ' Mean'] for result in results]),
+            depths, max_depths, interpolation)
+    return resampled
+
+
+def compile_batch(profiles, results, percentiles=(), depth_step=1.0,
+                  max_depth=None, interpolation='step'):
+    '''
+    Aggregates the per-profile results in memory into (profile x column x
+    period) and (profile x depth) cubes and reduces them to the batch means
+    :param list percentiles:
+        Percentiles (0 - 100) of the profile means to report
+    :param float depth_step:
+        Spacing (m) of the depth grid the profile means are resampled on
+    :param float max_depth:
+        Depth (m) of the grid; by default that of the first profile
+    :param str interpolation:
+        'step' or 'linear' resampling of the layer values on the grid
+    '''
+    n_profiles = len(profiles)
+    period = results[0]['Period']
+    motions = sorted(set(m for result in results for m in result['Motions']))
+    pairs = sorted(set(m[:2] for m in motions))
+    batch = {'Profiles': profiles, 'Period': period, 'Motions': motions,
+             'Pairs': pairs, 'Percentiles': list(percentiles)}
+
+    for key in BATCH_SPECTRA:
+        labels = motions if key == 'Surface' else pairs
+        batch[key] = np.full([n_profiles, len(labels) + 1, len(period)],
+                             np.nan)
+    for iloc, (profile, result) in enumerate(zip(profiles, results)):
+        if not np.array_equal(result['Period'], period):
+            raise ValueError(f"Periods of {profile} differ from those of "
+                             f"{profiles[0]}!")
+        for key in BATCH_SPECTRA:
+            batch[key][iloc] = _batch_rows(result, key, motions, pairs)
+
+    # Resample the profile means on the common depth grid
+    depths = _depth_grid(results[0], depth_step, max_depth)
+    batch['Depth'] = depths
+    for key, values in _resample_means(results, depths,
+                                       interpolation).items():
+        batch[key + ' Mean'] = values
+
+    # RS Geomean for batch run, over the profiles valid at each cell
+    for key in BATCH_SPECTRA:
+        batch[key + ' Batch'] = nan_geomean(batch[key])
+        batch[key + ' Batch Mean'] = batch[key + ' Batch'][-1]
+
+    if percentiles:
+        for key in BATCH_SPECTRA:
+            batch[key + ' Batch Percentiles'] = np.nanpercentile(
+                batch[key][:, -1, :], percentiles, axis=0)
+        for key in PROFILE_QUANTITIES:
+            batch[key + ' Batch Percentiles'] = np.nanpercentile(
+                batch[key + ' Mean'], percentiles, axis=0)
+    return batch
+
+
+class StreamingBatch(object):
+    '''
+    Constant-memory alternative to compile_batch for very large batches. The
+    profile results are folded in one at a time into running log-sums (for
+    the geometric means), sums and counts (for the arithmetic means of the
+    depth profiles) and optional reservoir samples (for the percentiles), so
+    the per-profile columns of the merged workbooks are not kept.
+    '''
+    def __init__(self, profiles, motions, percentiles=(),
+                 reservoir_size=1000, seed=None, depth_step=1.0,
+                 max_depth=None, interpolation='step'):
+        '''
+        :param list profiles:
+            Profiles of the batch
+        :param list motions:
+            Motion names found across all profiles
+        :param list percentiles:
+            Percentiles (0 - 100) of the profile means to report
+        :param int reservoir_size:
+            Number of profiles kept for the percentile estimates
+        :param depth_step, max_depth, interpolation:
+            Depth grid and resampling of the profile means, as for
+            compile_batch
+        '''
+        self.profiles = profiles
+        self.motions = sorted(motions)
+        self.pairs = sorted(set(m[:2] for m in self.motions))
+        self.percentiles = list(percentiles)
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        self.depth_step = depth_step
+        self.max_depth = max_depth
+        self.interpolation = interpolation
+        self.period = None
+
+    def _setup(self, result):
+        '''
+        Allocates the accumulators on the periods and depths of the first
+        profile
+        '''
+        self.period = result['Period']
+        self.depths = _depth_grid(result, self.depth_step, self.max_depth)
+        self.gm, self.reservoirs = {}, {}
+        for key in BATCH_SPECTRA:
+            labels = self.motions if key == 'Surface' else self.pairs
+            self.gm[key] = RunningLogMean([len(labels) + 1, len(self.period)])
+        self.mean = {key: RunningMean(len(self.depths))
+                     for key in PROFILE_QUANTITIES}
+        if self.percentiles:
+            for key in BATCH_SPECTRA:
+                self.reservoirs[key] = Reservoir(
+                    len(self.period), self.reservoir_size, self.seed)
+            for key in PROFILE_QUANTITIES:
+                self.reservoirs[key] = Reservoir(
+                    len(self.depths), self.reservoir_size, self.seed)
+
+    def add(self, profile, result):
+        '''
+        Folds the results of a profile into the running statistics
+        '''
+        if self.period is None:
+            self._setup(result)
+        elif not np.array_equal(result['Period'], self.period):
+            raise ValueError(f"Periods of {profile} differ from those of "
+                             f"the other profiles!")
+        for key in BATCH_SPECTRA:
+            values = _batch_rows(result, key, self.motions, self.pairs)
+            self.gm[key].add(values)
+            if self.percentiles:
+                self.reservoirs[key].add(values[-1])
+        resampled = _resample_means([result], self.depths,
+                                    self.interpolation)
+        for key, values in resampled.items():
+            self.mean[key].add(values[0])
+            if self.percentiles:
+                self.reservoirs[key].add(values[0])
+
+    def finalize(self):
+        '''
+        Returns the batch means in the layout of compile_batch, without the
+        per-profile cubes
+        '''
+        batch = {'Profiles': self.profiles, 'Period': self.period,
+                 'Motions': self.motions, 'Pairs': self.pairs,
+                 'Percentiles': self.percentiles, 'Depth': self.depths}
+        for key in BATCH_SPECTRA:
+            batch[key + ' Batch'] = self.gm[key].result()
+            batch[key + ' Batch Mean'] = batch[key + ' Batch'][-1]
+        for key in PROFILE_QUANTITIES:
+            batch[key + ' Batch Mean'] = self.mean[key].result()
+        if self.percentiles:
+            for key in BATCH_SPECTRA + PROFILE_QUANTITIES:
+                batch[key + ' Batch Percentiles'] = \
+                    self.reservoirs[key].percentile(self.percentiles)
+        return batch
+
+
+def write_merged_excel(batch, analysis='NL'):
+    '''
+    Exports the batch results to the RS, GMs and Profile merged workbooks
+    '''
+    output_dir = ANALYSES[analysis]['output_dir']
+    gm_sheets = {'Surface': 'Surface Motion',
+                 'Surface GeoMean': 'Surface ' + ANALYSES[analysis]['gm_sheet'],
+                 'Amplification': 'Amplification Spectra',
+                 'Amplification x_IM,ref': 'Amplification x_IM,ref'}
+    period = pd.Index(batch['Period'], name='PERIOD')
+    mean_cols = ['Mean ' + profile[8:] for profile in batch['Profiles']]
+    pct_cols = [f"P{q:g}" for q in batch['Percentiles']]
+
+    def _comb(key, index, per_profile, mean_col):
+        # per-profile columns are only kept by compile_batch
+        df = pd.DataFrame(index=index)
+        if per_profile is not None:
+            df[mean_cols] = per_profile.T
+        if key + ' Batch Mean' in batch:
+            df[mean_col] = batch[key + ' Batch Mean']
+        if pct_cols:
+            df[pct_cols] = batch[key + ' Batch Percentiles'].T
+        return df
+
+    # Write RS_Merged
+    writer_Merged_RS = pd.ExcelWriter(output_dir + 'RS_Merged.xlsx')
+    for key, sheet in (('Surface GeoMean', 'Surface GM Spectra'),
+                       ('Amplification', 'Amplification Spectra'),
+                       ('Amplification x_IM,ref', 'Amplification x_IM,ref')):
+        per_profile = batch[key][:, -1, :] if key in batch else None
+        _comb(key, period, per_profile, 'Sa (g)').to_excel(writer_Merged_RS,
+                                                           sheet)
+    writer_Merged_RS.save()
+
+    # Write GMs_Merged
+    writer_Merged_GMs = pd.ExcelWriter(output_dir + 'GMs_Merged.xlsx')
+    for key in BATCH_SPECTRA:
+        labels = batch['Motions'] if key == 'Surface' else batch['Pairs']
+        pd.DataFrame(batch[key + ' Batch'].T, index=period,
+                     columns=labels + ['Mean']).to_excel(writer_Merged_GMs,
+                                                         gm_sheets[key])
+    writer_Merged_GMs.save()
+
+    # Write Profile_Merged
+    depth = pd.Index(batch['Depth'], name='Depth')
+    writer_Merged_Prof = pd.ExcelWriter(output_dir + 'Profile_Merged.xlsx')
+    for key in PROFILE_QUANTITIES:
+        per_profile = batch[key + ' Mean'] if key + ' Mean' in batch else None
+        _comb(key, depth, per_profile, 'Mean').to_excel(writer_Merged_Prof,
+                                                        key)
+    writer_Merged_Prof.save()
+
+
+def _is_current(profile, folders, entries, analysis):
+    '''
+    Checks whether the stored results of a profile are up to date with its
+    motion databases, judging from their size and mtime only
+    '''
+    store_dir = ANALYSES[analysis]['store_dir']
+    if not entries or set(entries) != set(folders) or \
+            not os.path.exists(rs.profile_archive(store_dir, profile)):
+        return False
+    return all(cc.is_unchanged(_db_path(profile, folder, analysis),
+                               entries[folder]) for folder in folders)
+
+
+# Below this many motion databases to extract, profiles are merged in-process
+# as starting the worker processes would take longer than the work itself
+MIN_POOL_DATABASES = 8
+
+
+def _task_size(profile, jobs):
+    '''
+    Returns the size of a merge task as the bytes on disk and number of its
+    motion databases
+    '''
+    n_bytes = n_dbs = 0
+    for analysis, (folders, entries) in jobs.items():
+        for folder in folders:
+            n_bytes += os.path.getsize(_db_path(profile, folder, analysis))
+            n_dbs += 1
+    return n_bytes, n_dbs
+
+
+def _merge_task(task):
+    '''
+    Runs a (profile, jobs) task, tagging the result with its profile
+    '''
+    profile, jobs = task
+    return profile, merge_profile(profile, jobs)
+
+
+def run_tasks(tasks, workers=None, chunksize=1):
+    '''
+    Runs the merge tasks largest first so that a slow profile does not stall
+    the end of the batch
+    :param dict tasks:
+        Jobs of merge_profile keyed by profile
+    :param int workers:
+        Number of worker processes; by default one per CPU
+    :param int chunksize:
+        Number of tasks sent to a worker at a time
+    :returns:
+        Iterator of (profile, merged results) in order of completion
+    '''
+    sizes = {profile: _task_size(profile, jobs)
+             for profile, jobs in tasks.items()}
+    ordered = sorted(tasks.items(), key=lambda task: sizes[task[0]],
+                     reverse=True)
+    workers = min(workers or os.cpu_count() or 1, len(ordered))
+    n_dbs = sum(n_dbs for n_bytes, n_dbs in sizes.values())
+    if workers <= 1 or n_dbs < MIN_POOL_DATABASES:
+        for task in ordered:
+            yield _merge_task(task)
+        return
+    with mp.Pool(workers) as pool:
+        yield from pool.imap_unordered(_merge_task, ordered, chunksize)
+
+
+def compile_analyses(input_dir, analyses, full=False, streaming=False,
+                     percentiles=(), reservoir_size=1000, on_profile=None,
+                     workers=None, chunksize=1, **depth_options):
+    '''
+    Compiles the requested analysis types from one walk of the input tree,
+    dispatching one task per profile that extracts all of its stale
+    databases, and refreshes the results store
+    :param bool streaming:
+        Fold each profile into a StreamingBatch as soon as it is available
+        instead of keeping every profile in memory for compile_batch
+    :param list percentiles:
+        Percentiles (0 - 100) of the profile means to report
+    :param int reservoir_size:
+        Number of profiles sampled for the streaming percentile estimates
+    :param on_profile:
+        Optional callable (profile, result, analysis) run on every recompiled
+        profile result before it is released, e.g. write_profile_excel; the
+        profiles read from the store are only passed on if their workbooks
+        are missing
+    :param int workers, chunksize:
+        Process pool settings, as for run_tasks
+    :param depth_options:
+        depth_step, max_depth and interpolation of the depth grid, as for
+        compile_batch
+    :returns:
+        Dictionary of batch results keyed by analysis type; requested
+        analyses without databases are skipped with a warning, and none
+        having any raises FileNotFoundError
+    '''
+    tree = discover_profiles(input_dir)
+    missing = [analysis for analysis in analyses if not tree[analysis]]
+    analyses = [analysis for analysis in analyses if tree[analysis]]
+    if not analyses:
+        raise FileNotFoundError(
+            "No " + " or ".join(ANALYSES[analysis]['db']
+                                for analysis in missing) +
+            f" databases found in {input_dir}!")
+    for analysis in missing:
+        warnings.warn(f"No {ANALYSES[analysis]['db']} databases found in "
+                      f"{input_dir}; skipping the {analysis} analysis.")
+    profiles = sorted(set(profile for analysis in analyses
+                          for profile in tree[analysis]),
+                      key=lambda f: int(f[8:]))
+
+    # profiles whose databases are all unchanged are read from the store
+    manifests = {analysis: {} if full else
+                 cc.load_manifest(ANALYSES[analysis]['store_dir'])
+                 for analysis in analyses}
+    tasks = {}
+    for profile in profiles:
+        for analysis in analyses:
+            if profile not in tree[analysis]:
+                continue
+            folders = tree[analysis][profile]
+            entries = manifests[analysis].get(profile)
+            if not _is_current(profile, folders, entries, analysis):
+                tasks.setdefault(profile, {})[analysis] = (folders, entries)
+    for analysis in analyses:
+        n_stale = sum(analysis in jobs for jobs in tasks.values())
+        print(f"Compiling {n_stale} of {len(tree[analysis])} "
+              f"{analysis} profiles...")
+
+    aggregators = {}
+    for analysis in analyses:
+        if streaming:
+            motions = set(ANALYSES[analysis]['motion'](folder)
+                          for folders in tree[analysis].values()
+                          for folder in folders)
+            # profiles arrive in any order, so the default grid is set here
+            options = dict(depth_options)
+            if options.get('max_depth') is None:
+                first = next(iter(tree[analysis]))
+                options['max_depth'] = dr.profile_depth(read_motion_db(
+                    _db_path(first, tree[analysis][first][0], analysis)
+                    )['Depth Mid'])
+            aggregators[analysis] = StreamingBatch(
+                list(tree[analysis]), motions, percentiles, reservoir_size,
+                **options)
+        else:
+            aggregators[analysis] = {}
+
+    def _collect(profile, compiled):
+        for analysis in analyses:
+            if profile not in tree[analysis]:
+                continue
+            store_dir = ANALYSES[analysis]['store_dir']
+            recompiled = analysis in compiled
+            if recompiled:
+                result, manifests[analysis][profile] = compiled[analysis]
+                rs.save_profile(store_dir, profile, result)
+            else:
+                with rs.load_profile(store_dir, profile) as archive:
+                    result = dict(archive)
+            # workbooks of unchanged profiles are left as they were
+            if on_profile is not None and (recompiled or not all(
+                    os.path.exists(workbook)
+                    for workbook in profile_workbooks(profile, analysis))):
+                on_profile(profile, result, analysis)
+            if streaming:
+                aggregators[analysis].add(profile, result)
+            else:
+                aggregators[analysis][profile] = result
+
+    # workers return their arrays for in-memory aggregation as they finish
+    for profile, compiled in run_tasks(tasks, workers, chunksize):
+        _collect(profile, compiled)
+    for profile in profiles:
+        if profile not in tasks:
+            _collect(profile, {})
+
+    batches = {}
+    for analysis in analyses:
+        store_dir = ANALYSES[analysis]['store_dir']
+        if streaming:
+            batch = aggregators[analysis].finalize()
+        else:
+            results = aggregators[analysis]
+            batch = compile_batch(list(tree[analysis]),
+                                  [results[profile]
+                                   for profile in tree[analysis]],
+                                  percentiles, **depth_options)
+
+        # binary store is the primary output; workbooks are views over it
+        rs.save_batch(store_dir, batch)
+        cc.save_manifest(store_dir, {profile: manifests[analysis][profile]
+                                     for profile in tree[analysis]})
+        batches[analysis] = batch
+    return batches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compiles the batch output of DEEPSOIL randomized "
+                    "profiles.")
+    parser.add_argument('--analysis', action='append',
+                        choices=list(ANALYSES),
+                        help="analysis type to compile (repeatable); by "
+                             "default every type found in the input tree")
+    parser.add_argument('--no-profile-excel', action='store_true',
+                        help="skip the per-profile RS/Profile workbooks")
+    parser.add_argument('--full', action='store_true',
+                        help="recompile every profile, ignoring the manifest "
+                             "of the previous run")
+    parser.add_argument('--from-store', action='store_true',
+                        help="re-export the workbooks from the results store "
+                             "without reading the DEEPSOIL databases")
+    parser.add_argument('--streaming', action='store_true',
+                        help="constant-memory aggregation for very large "
+                             "batches; the merged workbooks then hold the "
+                             "batch means only, without per-profile columns")
+    parser.add_argument('--percentiles', nargs='+', type=float, default=[],
+                        metavar='Q',
+                        help="percentiles (0-100) of the profile means to add "
+                             "to the merged workbooks")
+    parser.add_argument('--reservoir-size', type=int, default=1000,
+                        help="number of profiles sampled for the percentiles "
+                             "in streaming mode (default: 1000)")
+    parser.add_argument('--workers', type=int,
+                        help="number of worker processes (default: one per "
+                             "CPU); 1 compiles in-process")
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help="number of profiles sent to a worker at a time "
+                             "(default: 1)")
+    parser.add_argument('--depth-step', type=float, default=1.0,
+                        help="spacing (m) of the depth grid of the merged "
+                             "profiles (default: 1.0)")
+    parser.add_argument('--max-depth', type=float,
+                        help="depth (m) of the grid of the merged profiles; "
+                             "by default that of the first profile")
+    parser.add_argument('--interpolation', choices=dr.INTERPOLATION,
+                        default='step',
+                        help="resampling of the layer values on the depth "
+                             "grid: value of the layer above (step, default) "
+                             "or linear between layers")
+    args = parser.parse_args(argv)
+    analyses = args.analysis or list(ANALYSES)
+    export_profile = None if args.no_profile_excel else write_profile_excel
+
+    start_time = time.perf_counter()
+
+    if args.from_store:
+        batches = {}
+        for analysis in analyses:
+            store_dir = ANALYSES[analysis]['store_dir']
+            if not os.path.exists(rs.batch_archive(store_dir)):
+                continue
+            batches[analysis] = rs.load_batch(store_dir)
+            if export_profile is not None:
+                for profile in batches[analysis]['Profiles']:
+                    with rs.load_profile(store_dir, profile) as result:
+                        export_profile(profile, result, analysis)
+        if not batches:
+            raise FileNotFoundError("No compiled results found in the "
+                                    "results store!")
+    else:
+        batches = compile_analyses(os.path.abspath('./data/input_files/'),
+                                   analyses, args.full, args.streaming,
+                                   args.percentiles, args.reservoir_size,
+                                   export_profile, args.workers,
+                                   args.chunksize,
+                                   depth_step=args.depth_step,
+                                   max_depth=args.max_depth,
+                                   interpolation=args.interpolation)
+
+    # Excel export
+    for analysis, batch in batches.items():
+        output_dir = ANALYSES[analysis]['output_dir']
+        # output folder created if does not exist
+        if not os.path.exists(output_dir):
+            os.mkdir(output_dir)
+        write_merged_excel(batch, analysis)
+
+    end_time = time.perf_counter()
+    # Log run statistics
+    print(  f"Program ran successfully. "
+            f"Finished in {(end_time - start_time): .2f} seconds.")
+
+    input("Press ENTER to exit...")
+
+
+if __name__ == '__main__':
+    mp.freeze_support()
+    main()
@@ -0,0 +1,89 @@
+'''
+Manifest cache for incremental recompiles of DEEPSOIL batch output
+
+The manifest records the size, modification time and content hash of every
+motion database compiled into the results store. On a rerun, a database whose
+size and mtime are unchanged is taken as is; otherwise its hash decides
+whether the arrays kept in the store can be reused or the database has to be
+extracted again.
+'''
+
+import os
+import json
+import hashlib
+
+MANIFEST_FILE = 'manifest.json'
+
+
+def hash_file(filename, block_size=1 << 20):
+    '''
+    Returns the SHA-1 digest of the content of a file
+    '''
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _stat_entry(filename):
+    '''
+    Returns the size and modification time (ns) of a file
+    '''
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def is_unchanged(filename, entry):
+    '''
+    Checks the size and mtime of a file against its manifest entry, without
+    reading the file
+    '''
+    if not entry:
+        return False
+    stat = _stat_entry(filename)
+    return stat['size'] == entry['size'] and stat['mtime'] == entry['mtime']
+
+
+def fingerprint(filename, entry=None):
+    '''
+    Returns the manifest entry of a file and whether its content changed
+    since the given previous entry
+    :param str filename:
+        Path to the motion database
+    :param dict entry:
+        Manifest entry of the previous run, if any
+    :returns:
+        new entry - Dictionary of 'size', 'mtime' and 'sha1'
+        changed - False only if the content is known to be the same
+    '''
+    new_entry = _stat_entry(filename)
+    if entry and new_entry['size'] == entry['size'] and \
+            new_entry['mtime'] == entry['mtime']:
+        new_entry['sha1'] = entry['sha1']
+        return new_entry, False
+    new_entry['sha1'] = hash_file(filename)
+    return new_entry, not (entry and new_entry['sha1'] == entry['sha1'])
+
+
+def load_manifest(store_dir):
+    '''
+    Loads the manifest of the results store; empty if none was written yet
+    '''
+    filename = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def save_manifest(store_dir, manifest):
+    '''
+    Writes the manifest of the results store
+    '''
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+    filename = os.path.join(store_dir, MANIFEST_FILE)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(filename + '.tmp', filename)
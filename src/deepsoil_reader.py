@@ -0,0 +1,61 @@
+'''
+Reader layer for DEEPSOIL output databases (deepsoilout.db3)
+
+Every database is opened once, read-only, and its RESPONSE_SPECTRA and
+PROFILES tables are pulled straight into NumPy arrays. The result is a compact
+per-motion record that the compile step consumes without intermediate
+DataFrames.
+'''
+
+import os
+import sqlite3
+import numpy as np
+from urllib.request import pathname2url
+
+RS_COLUMNS = ('PERIOD', 'INPUT_MOTION_RS', 'LAYER1_RS')
+PROFILE_COLUMNS = ('DEPTH_LAYER_TOP', 'MIN_DISP_RELATIVE', 'MAX_DISP_RELATIVE',
+                   'DEPTH_LAYER_MID', 'MAX_STRAIN', 'MAX_STRESS_RATIO')
+
+
+def _fetch_array(conn, table, columns):
+    '''
+    Fetches the given columns of a table as a 2-D float array
+    '''
+    rows = conn.execute(
+        'SELECT ' + ', '.join(columns) + ' FROM ' + table).fetchall()
+    return np.array(rows, dtype=float).reshape(-1, len(columns))
+
+
+def read_motion_db(db_path):
+    '''
+    Extracts the response spectra and profile maxima of a single motion
+    :param str db_path:
+        Path to the DEEPSOIL output database of the motion
+    :returns:
+        Dictionary of 1-D arrays
+            'Period' - Spectral periods (s)
+            'Input' - Input motion response spectrum (g)
+            'Surface' - Surface (layer 1) response spectrum (g)
+            'Depth Top' - Depth to the top of each layer
+            'Displacement' - Maximum absolute relative displacement
+            'Depth Mid' - Depth to the middle of each layer
+            'Strain' - Maximum strain (%)
+            'Stress Ratio' - Maximum stress ratio
+    '''
+    # read-only URI so that a missing database is not silently created
+    uri = 'file:' + pathname2url(os.path.abspath(db_path)) + '?mode=ro'
+    conn = sqlite3.connect(uri, uri=True)
+    try:
+        rs = _fetch_array(conn, 'RESPONSE_SPECTRA', RS_COLUMNS)
+        pf = _fetch_array(conn, 'PROFILES', PROFILE_COLUMNS)
+    finally:
+        conn.close()
+
+    return {'Period': rs[:, 0],
+            'Input': rs[:, 1],
+            'Surface': rs[:, 2],
+            'Depth Top': pf[:, 0],
+            'Displacement': np.fmax(np.fabs(pf[:, 1]), np.fabs(pf[:, 2])),
+            'Depth Mid': pf[:, 3],
+            'Strain': pf[:, 4],
+            'Stress Ratio': pf[:, 5]}
@@ -0,0 +1,96 @@
+'''
+Batched resampling of layered soil profiles on a common depth grid
+
+The layer depths and values of all profiles are stacked into padded
+(profile x layer) arrays, and every grid depth is located in its profile by a
+single searchsorted pass over the stacked depths, offset per profile so that
+the profiles do not overlap.
+'''
+
+import math
+import numpy as np
+
+INTERPOLATION = ('step', 'linear')
+
+
+def depth_grid(max_depth, step=1.0):
+    '''
+    Returns the grid of depths at the middle of each interval of the given
+    step down to max_depth
+    '''
+    return np.arange(step / 2., max_depth, step)
+
+
+def profile_depth(layer_depths):
+    '''
+    Returns the depth down to which a profile is resampled, i.e. its deepest
+    layer midpoint rounded up to the metre
+    '''
+    return math.ceil(layer_depths[-1])
+
+
+def stack_layers(arrays):
+    '''
+    Stacks 1-D arrays of different lengths into a (profile x layer) array,
+    padding each row with its own last value
+    '''
+    n_layers = max(len(array) for array in arrays)
+    stacked = np.empty([len(arrays), n_layers], dtype=float)
+    for iloc, array in enumerate(arrays):
+        stacked[iloc, :len(array)] = array
+        stacked[iloc, len(array):] = array[-1]
+    return stacked
+
+
+def resample(layer_depths, values, grid, max_depths, method='step'):
+    '''
+    Resamples layered values of several profiles on a common depth grid
+    :param numpy.ndarray layer_depths:
+        (profile x layer) depths of the layers, increasing along each row
+    :param numpy.ndarray values:
+        (profile x layer) values at the layer depths
+    :param numpy.ndarray grid:
+        Depths to resample at
+    :param numpy.ndarray max_depths:
+        Depth of each profile; grid depths at or below it are left empty
+    :param str method:
+        'step' takes the value of the last layer at or above each grid depth
+        (as pandas.merge_asof); 'linear' interpolates between the bracketing
+        layers and holds the value of the deepest layer below it
+    :returns:
+        (profile x grid) resampled values; NaN above the first layer and
+        below the depth of the profile
+    '''
+    if method not in INTERPOLATION:
+        raise ValueError(f"Unknown interpolation method '{method}'; expected "
+                         f"one of {INTERPOLATION}!")
+    layer_depths = np.atleast_2d(layer_depths)
+    values = np.atleast_2d(values)
+    grid = np.asarray(grid, dtype=float)
+    n_profiles, n_layers = layer_depths.shape
+    if not len(grid):
+        return np.empty([n_profiles, 0])
+
+    # offset each profile past the depths of the previous one
+    low = min(layer_depths.min(), grid[0])
+    span = max(layer_depths.max(), grid[-1]) - low + 1.
+    offsets = span * np.arange(n_profiles)[:, np.newaxis]
+    iloc = np.searchsorted((layer_depths - low + offsets).ravel(),
+                           (grid - low + offsets).ravel(), side='right')
+    iloc = iloc.reshape(n_profiles, len(grid)) - 1
+    iloc -= n_layers * np.arange(n_profiles)[:, np.newaxis]
+    above = iloc < 0
+    iloc = np.clip(iloc, 0, n_layers - 1)
+
+    rows = np.arange(n_profiles)[:, np.newaxis]
+    resampled = values[rows, iloc]
+    if method == 'linear':
+        inext = np.minimum(iloc + 1, n_layers - 1)
+        dz = layer_depths[rows, inext] - layer_depths[rows, iloc]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = np.where(dz > 0, (grid - layer_depths[rows, iloc]) / dz,
+                              0.)
+        resampled = resampled + weight * (values[rows, inext] - resampled)
+
+    outside = above | (grid >= np.asarray(max_depths)[:, np.newaxis])
+    return np.where(outside, np.nan, resampled)
@@ -0,0 +1,72 @@
+'''
+NaN-aware geometric means reduced in log space
+
+Geometric means are taken as the exponential of the mean logarithm over the
+valid (non-NaN) cells, with the number of valid values counted per cell. This
+avoids the overflow/underflow of forming the product of many spectral
+ordinates before raising it to a power. As with the power of the product,
+the mean is that of the magnitudes when an even number of the values are
+negative, and NaN when an odd number are; e.g. the -inf reported by DEEPSOIL
+for a diverged analysis gives NaN with a positive ordinate and an infinite
+mean with another -inf.
+'''
+
+import numpy as np
+
+
+def log_values(values):
+    '''
+    Returns the logarithms of the magnitudes of the values (0 where NaN), the
+    mask of valid cells and the mask of negative cells
+    '''
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    with np.errstate(divide='ignore'):
+        logs = np.log(np.abs(np.where(valid, values, 1.)))
+    return logs, valid, values < 0
+
+
+def log_sum(values, axis=0):
+    '''
+    Returns the sum of the logarithms of the valid cells along an axis, the
+    number of valid cells summed and the number of them that are negative
+    '''
+    logs, valid, negative = log_values(values)
+    return (np.sum(logs, axis=axis), np.sum(valid, axis=axis),
+            np.sum(negative, axis=axis))
+
+
+def from_log_sum(log_sum, count, negatives=0):
+    '''
+    Returns the geometric mean from a sum of logarithms, its per-cell count
+    and number of negative values; NaN where no value was valid or an odd
+    number were negative
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where((count > 0) & (np.asarray(negatives) % 2 == 0),
+                        np.exp(log_sum / np.maximum(count, 1)), np.nan)
+
+
+def nan_geomean(values, axis=0):
+    '''
+    Geometric mean along an axis skipping NaN cells
+    :param values:
+        Array (or sequence of equally shaped arrays) of positive values
+    :param int axis:
+        Axis to reduce
+    '''
+    return from_log_sum(*log_sum(values, axis))
+
+
+def nan_geomean_reduceat(values, starts, axis=0):
+    '''
+    Geometric means of consecutive groups of slices along an axis (e.g. the
+    two components of each ground-motion pair), skipping NaN cells
+    :param list starts:
+        Indices where each group begins, as for numpy.ufunc.reduceat
+    '''
+    logs, valid, negative = log_values(values)
+    return from_log_sum(np.add.reduceat(logs, starts, axis=axis),
+                        np.add.reduceat(valid.astype(int), starts, axis=axis),
+                        np.add.reduceat(negative.astype(int), starts,
+                                        axis=axis))
@@ -24,6 +24,8 @@ Tools for supplementing Ground Motion Intensity Measures (IMs) from a set of
 acceleration time series
 '''
 
+import hashlib
+from collections import OrderedDict
 import numpy as np
 from math import pi
 from scipy.integrate import cumtrapz
@@ -31,6 +33,7 @@ from scipy.stats import scoreatpercentile
 from scipy import constants
 import matplotlib.pyplot as plt
 import response_spectrum as rsp
+from geomean import nan_geomean
 from sm_utils import (get_velocity_displacement,
                        get_time_vector,
                        convert_accel_units,
@@ -38,7 +41,101 @@ from sm_utils import (get_velocity_displacement,
                        nextpow2)
 
 RESP_METHOD = {'Newmark-Beta': rsp.NewmarkBeta,
-               'Nigam-Jennings': rsp.NigamJennings}
+               'Nigam-Jennings': rsp.NigamJennings,
+               'Recursive-Filter': rsp.RecursiveFilter}
+
+# Memory ceiling (bytes) of the blocks of rotated responses in the angle sweeps
+ROTATION_BLOCK_BYTES = 2 ** 28
+
+# Memory ceiling (bytes) of the cached oscillator responses of the records
+RESPONSE_CACHE_BYTES = 2 ** 28
+
+
+class ResponseCache(object):
+    """
+    Least-recently-used cache of the outputs of get_response_spectrum, keyed
+    by the content of the record and the parameters of the spectrum and
+    bounded by the bytes of the arrays it holds. The cached arrays are
+    read-only and the dictionaries are returned as copies
+    """
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+
+    @staticmethod
+    def key(acceleration, time_step, periods, damping, units, method, dtype):
+        """
+        Returns the key of the response spectrum of a record
+        """
+        acceleration = np.ascontiguousarray(acceleration)
+        return (hashlib.sha1(acceleration).hexdigest(),
+                acceleration.dtype.str, acceleration.shape, float(time_step),
+                np.asarray(periods, dtype=float).tobytes(),
+                np.asarray(damping, dtype=float).tobytes(), units, method,
+                np.dtype(dtype).str)
+
+    def get(self, key, histories=False):
+        """
+        Returns the cached (spectrum, time series, acceleration, velocity,
+        displacement) outputs, or None if not cached (or, if histories are
+        requested, cached without them)
+        """
+        entry = self._entries.get(key)
+        if entry is None or (histories and entry[4] is None):
+            return None
+        self._entries.move_to_end(key)
+        spectrum, time_series, accel, vel, disp = entry
+        if not histories:
+            accel = vel = disp = None
+        return dict(spectrum), dict(time_series), accel, vel, disp
+
+    def put(self, key, outputs):
+        """
+        Caches the outputs, evicting the least recently used outputs beyond
+        the memory ceiling, and returns them as get would. Outputs larger
+        than the ceiling are returned (read-only) without being cached
+        """
+        spectrum, time_series, accel, vel, disp = outputs
+        # copy the arrays of the dictionaries, which may be the inputs
+        spectrum, time_series = (
+            {name: np.array(value) if isinstance(value, np.ndarray) else value
+             for name, value in output.items()}
+            for output in (spectrum, time_series))
+        arrays = [value for value in list(spectrum.values()) +
+                  list(time_series.values()) + [accel, vel, disp]
+                  if isinstance(value, np.ndarray)]
+        for array in arrays:
+            array.flags.writeable = False
+        nbytes = sum(array.nbytes for array in arrays)
+        self.discard(key)
+        if nbytes <= self.max_bytes:
+            self._entries[key] = (spectrum, time_series, accel, vel, disp)
+            self.nbytes += nbytes
+            self._sizes[key] = nbytes
+            while self.nbytes > self.max_bytes:
+                self.discard(next(iter(self._entries)))
+        return dict(spectrum), dict(time_series), accel, vel, disp
+
+    def discard(self, key):
+        """
+        Removes the outputs of a key from the cache, if cached
+        """
+        if self._entries.pop(key, None) is not None:
+            self.nbytes -= self._sizes.pop(key)
+
+    def clear(self):
+        """
+        Empties the cache
+        """
+        self._entries.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+
+# Shared by the rotation-dependent measures within a process
+RESPONSE_CACHE = ResponseCache()
 
 def get_peak_measures(time_step, acceleration, get_vel=False,
     get_disp=False):
@@ -115,7 +212,8 @@ def plot_fourier_spectrum(time_series, time_step, figure_size=(7, 5),
 
 
 def get_response_spectrum(acceleration, time_step, periods, damping=0.05,
-        units="cm/s/s", method="Nigam-Jennings"):
+        units="cm/s/s", method="Nigam-Jennings", peaks_only=False,
+        dtype=np.float64, cache=RESPONSE_CACHE):
     '''
     Returns the elastic response spectrum of the acceleration time series.
     :param numpy.ndarray acceleration:
@@ -132,24 +230,96 @@ def get_response_spectrum(acceleration, time_step, periods, damping=0.05,
         Choice of method for calculation of the response spectrum
         - "Newmark-Beta"
         - "Nigam-Jennings"
+        - "Recursive-Filter" (Nigam-Jennings as compiled IIR filters)
+    :param bool peaks_only:
+        Skip the oscillator response time series, returned as None, for
+        callers that only use the spectrum
+    :param dtype:
+        Floating point type of the oscillator responses; a reduced precision
+        is checked against float64 at a sample of periods (see
+        :class: response_spectrum.ResponseSpectrum)
+    :param cache:
+        ResponseCache reusing the outputs for the same record and parameters
+        (None to always integrate); the cached arrays are read-only
     :returns:
         Outputs from :class: smtk.response_spectrum.BaseResponseSpectrum
     '''
+    if cache is not None:
+        key = cache.key(acceleration, time_step, periods, damping, units,
+                        method, dtype)
+        outputs = cache.get(key, histories=not peaks_only)
+        if outputs is not None:
+            return outputs
     response_spec = RESP_METHOD[method](acceleration,
                                         time_step,
                                         periods,
                                         damping,
-                                        units)
+                                        units,
+                                        peaks_only,
+                                        dtype)
     spectrum, time_series, accel, vel, disp = response_spec()
     spectrum["PGA"] = time_series["PGA"]
     spectrum["PGV"] = time_series["PGV"]
     spectrum["PGD"] = time_series["PGD"]
+    if cache is not None:
+        return cache.put(key, (spectrum, time_series, accel, vel, disp))
     return spectrum, time_series, accel, vel, disp
 
 
+def rotated_response_spectrum(acceleration_x, time_step_x, acceleration_y,
+        time_step_y, periods, angle, damping=0.05, units="cm/s/s",
+        method="Nigam-Jennings", cache=RESPONSE_CACHE):
+    '''
+    Returns the response spectra of a record pair rotated by an angle (as
+    rotate_horizontal), rotating the oscillator responses to the two
+    components instead of integrating the rotated pair. The responses are
+    taken from the cache when the components were already integrated, e.g.
+    by rotdpp or gmrotdpp; the absolute acceleration responses follow from
+    the rotated velocity and displacement responses by the equation of
+    motion
+    :param float angle:
+        Angle of rotation (decimal degrees)
+    :returns:
+        sax, say - Spectra of the rotated components, as from
+        get_response_spectrum
+    '''
+    if np.fabs(time_step_x - time_step_y) > 1E-10:
+        raise ValueError("Record pair must have the same time-step!")
+    acceleration_x, acceleration_y = equalise_series(acceleration_x,
+                                                     acceleration_y)
+    _, series_x, _, vel_x, disp_x = get_response_spectrum(
+        acceleration_x, time_step_x, periods, damping, units, method,
+        cache=cache)
+    _, series_y, _, vel_y, disp_y = get_response_spectrum(
+        acceleration_y, time_step_y, periods, damping, units, method,
+        cache=cache)
+    omega = (2. * np.pi) / np.asarray(periods)
+    spectra = []
+    for series, vel, disp in zip(
+            rotate_horizontal(series_x["Acceleration"],
+                              series_y["Acceleration"], angle),
+            rotate_horizontal(vel_x, vel_y, angle),
+            rotate_horizontal(disp_x, disp_y, angle)):
+        spectrum = {"Period": periods,
+                    "Velocity": np.max(np.fabs(vel), axis=0),
+                    "Displacement": np.max(np.fabs(disp), axis=0)}
+        spectrum["Acceleration"] = np.max(np.fabs(
+            2. * damping * omega * vel + (omega ** 2.) * disp), axis=0)
+        spectrum["Pseudo-Velocity"] = omega * spectrum["Displacement"]
+        spectrum["Pseudo-Acceleration"] = (omega ** 2.) *\
+            spectrum["Displacement"]
+        spectra.append(spectrum)
+    for key, ground in (("PGA", "Acceleration"), ("PGV", "Velocity"),
+                        ("PGD", "Displacement")):
+        for spectrum, series in zip(spectra, rotate_horizontal(
+                series_x[ground], series_y[ground], angle)):
+            spectrum[key] = np.max(np.fabs(series))
+    return tuple(spectra)
+
+
 def get_response_spectrum_pair(acceleration_x, time_step_x, acceleration_y,
         time_step_y, periods, damping=0.05, units="cm/s/s",
-        method="Nigam-Jennings"):
+        method="Nigam-Jennings", cache=RESPONSE_CACHE):
     '''
     Returns the response spectra of a record pair
     :param numpy.ndarray acceleration_x:
@@ -160,6 +330,8 @@ def get_response_spectrum_pair(acceleration_x, time_step_x, acceleration_y,
         Acceleration time-series of y-component of record
     :param float time_step_y:
         Time step of y-time series (s)
+    :param cache:
+        ResponseCache of the spectra (see get_response_spectrum)
     '''
 
     sax = get_response_spectrum(acceleration_x,
@@ -167,13 +339,17 @@ def get_response_spectrum_pair(acceleration_x, time_step_x, acceleration_y,
                                 periods,
                                 damping,
                                 units,
-                                method)[0]
+                                method,
+                                peaks_only=True,
+                                cache=cache)[0]
     say = get_response_spectrum(acceleration_y,
                                 time_step_y,
                                 periods,
                                 damping,
                                 units,
-                                method)[0]
+                                method,
+                                peaks_only=True,
+                                cache=cache)[0]
     return sax, say
 
 def geometric_mean_spectrum(sax, say):
@@ -189,7 +365,7 @@ def geometric_mean_spectrum(sax, say):
         if key == "Period":
             sa_gm[key] = sax[key]
         else:
-            sa_gm[key] = np.sqrt(sax[key] * say[key])
+            sa_gm[key] = nan_geomean([sax[key], say[key]])
     return sa_gm
 
 def arithmetic_mean_spectrum(sax, say):
@@ -263,11 +439,25 @@ def equalise_series(series_x, series_y):
         return series_x, series_y
 
 def gmrotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
-        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings"):
+        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings",
+        max_bytes=ROTATION_BLOCK_BYTES, angle_step=1., adaptive=False,
+        coarse_step=5., dtype=np.float64):
     """
     Returns the rotationally-dependent geometric mean
     :param float percentile:
         Percentile of angles (float)
+    :param int max_bytes:
+        Memory ceiling of the blocks of rotated responses
+    :param float angle_step:
+        Step (degrees) of the rotation angles
+    :param bool adaptive:
+        Sweep the angles at coarse_step only, and rotate to the other angles
+        only where they can move the percentile (see rotdpp)
+    :param float coarse_step:
+        Step (degrees) of the coarse sweep of the adaptive mode
+    :param dtype:
+        Floating point type of the oscillator responses (see
+        get_response_spectrum)
     :returns:
         - Dictionary contaning
         * angles - Array of rotation angles
@@ -277,6 +467,8 @@ def gmrotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
         * GeoMeanPerAngle - An array of [Number Angles, Number Periods]
           indicating the Geometric Mean of the record pair when rotated to
           each period
+        * Error - In adaptive mode, the bound on the relative error of
+                  GMRotDpp against the full sweep
     """
     if (percentile > 100. + 1E-9) or (percentile < 0.):
         raise ValueError("Percentile for GMRotDpp must be between 0. and 100.")
@@ -284,30 +476,49 @@ def gmrotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
     sax, _, x_a, _, _ = get_response_spectrum(acceleration_x,
                                               time_step_x,
                                               periods, damping,
-                                              units, method)
+                                              units, method,
+                                              dtype=dtype)
     say, _, y_a, _, _ = get_response_spectrum(acceleration_y,
                                               time_step_y,
                                               periods, damping,
-                                              units, method)
+                                              units, method,
+                                              dtype=dtype)
     x_a, y_a = equalise_series(x_a, y_a)
-    angles = np.arange(0., 90., 1.)
-    max_a_theta = np.zeros([len(angles), len(periods)], dtype=float)
-    max_a_theta[0, :] = np.sqrt(np.max(np.fabs(x_a), axis=0) *
-                                np.max(np.fabs(y_a), axis=0))
-    for iloc, theta in enumerate(angles):
-        if iloc == 0:
-            max_a_theta[iloc, :] = np.sqrt(np.max(np.fabs(x_a), axis=0) *
-                                           np.max(np.fabs(y_a), axis=0))
-        else:
-            rot_x, rot_y = rotate_horizontal(x_a, y_a, theta)
-            max_a_theta[iloc, :] = np.sqrt(np.max(np.fabs(rot_x), axis=0) *
-                                           np.max(np.fabs(rot_y), axis=0))
-
-    gmrotd = np.percentile(max_a_theta, percentile, axis=0)
+    angles = np.arange(0., 90., angle_step)
+    # the y-component rotated by theta is the x-component rotated by
+    # theta + 90, so both come from one sweep over 180 degrees
+    sweep = np.concatenate([angles, angles + 90.])
+    n_angles = len(angles)
+    if not adaptive:
+        max_theta = _rotated_peaks(x_a, y_a, sweep, max_bytes)
+        max_a_theta = np.sqrt(max_theta[:n_angles] * max_theta[n_angles:])
+        gmrotd = np.percentile(max_a_theta, percentile, axis=0)
+        return {"angles": angles,
+                "periods": periods,
+                "GMRotDpp": gmrotd,
+                "GeoMeanPerAngle": max_a_theta}
+
+    # bounds on the geometric means follow from those on the peaks
+    bounds = [np.sqrt(peaks[:n_angles] * peaks[n_angles:])
+              for peaks in _interpolated_peaks(x_a, y_a, sweep, coarse_step,
+                                               max_bytes)]
+
+    def evaluate(refine, col):
+        peaks = _rotated_peaks(x_a[:, col], y_a[:, col],
+                               np.concatenate([angles[refine],
+                                               angles[refine] + 90.]),
+                               max_bytes)[:, 0]
+        n_refine = np.sum(refine)
+        return np.sqrt(peaks[:n_refine] * peaks[n_refine:])
+    max_a_theta, gmrotd, error = _refine_percentile(*bounds, percentile,
+                                                    evaluate)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        error = np.where(gmrotd > 0., error / gmrotd, 0.)
     return {"angles": angles,
             "periods": periods,
             "GMRotDpp": gmrotd,
-            "GeoMeanPerAngle": max_a_theta}
+            "GeoMeanPerAngle": max_a_theta,
+            "Error": error}
 
 KEY_LIST = ["PGA", "PGV", "PGD", "Acceleration", "Velocity",
             "Displacement", "Pseudo-Acceleration", "Pseudo-Velocity"]
@@ -346,10 +557,11 @@ def gmrotdpp_slow(acceleration_x, time_step_x, acceleration_y, time_step_y,
             rot_x, rot_y = (accel_x, accel_y)
         else:
             rot_x, rot_y = rotate_horizontal(accel_x, accel_y, theta)
+        # the rotated records are not reused
         sax, say = get_response_spectrum_pair(rot_x, time_step_x,
                                               rot_y, time_step_y,
                                               periods, damping,
-                                              units, method)
+                                              units, method, cache=None)
 
         sa_gm = geometric_mean_spectrum(sax, say)
         for key in KEY_LIST:
@@ -383,37 +595,323 @@ def _get_gmrotd_penalty(gmrotd, gmtheta):
 
 
 def gmrotipp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
-        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings"):
+        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings",
+        max_bytes=ROTATION_BLOCK_BYTES, angle_step=1., adaptive=False,
+        coarse_step=5.):
     """
     Returns the rotationally-independent geometric mean (GMRotIpp)
     """
     acceleration_x, acceleration_y = equalise_series(acceleration_x,
                                                      acceleration_y)
     gmrot = gmrotdpp(acceleration_x, time_step_x, acceleration_y,
-                     time_step_y, periods, percentile, damping, units, method)
+                     time_step_y, periods, percentile, damping, units, method,
+                     max_bytes, angle_step, adaptive, coarse_step)
 
 
     min_loc, penalty = _get_gmrotd_penalty(gmrot["GMRotDpp"],
                                            gmrot["GeoMeanPerAngle"])
     target_angle = gmrot["angles"][min_loc]
 
-    rot_hist_x, rot_hist_y = rotate_horizontal(acceleration_x,
-                                               acceleration_y,
-                                               target_angle)
-    sax, say = get_response_spectrum_pair(rot_hist_x, time_step_x,
-                                          rot_hist_y, time_step_y,
-                                          periods, damping, units, method)
+    sax, say = rotated_response_spectrum(acceleration_x, time_step_x,
+                                         acceleration_y, time_step_y,
+                                         periods, target_angle, damping,
+                                         units, method)
 
     gmroti = geometric_mean_spectrum(sax, say)
     gmroti["GMRotD{:.2f}".format(percentile)] = gmrot["GMRotDpp"]
     return gmroti
 
 
+def _rotated_peaks(series_x, series_y, angles,
+        max_bytes=ROTATION_BLOCK_BYTES):
+    """
+    Returns the peak absolute values over time of the series rotated to each
+    angle, cos(theta) * x(t) + sin(theta) * y(t). The sweep is done as one
+    (angles x 2) @ (2 x steps) matrix product per block of columns and time
+    steps sized to the memory ceiling, keeping running maxima per angle
+    :param numpy.ndarray series_x:
+        (steps x columns) time series of the x-component
+    :param numpy.ndarray series_y:
+        (steps x columns) time series of the y-component
+    :param numpy.ndarray angles:
+        Rotation angles (degrees)
+    :param int max_bytes:
+        Memory ceiling of a block of rotated values
+    :returns:
+        (angles x columns) peak values
+    """
+    theta_rad = np.radians(angles)
+    series_x = np.reshape(series_x, (len(series_x), -1))
+    series_y = np.reshape(series_y, (len(series_y), -1))
+    # rotate in the precision of the series
+    dtype = np.result_type(series_x, series_y, np.float32)
+    rotation = np.column_stack([np.cos(theta_rad),
+                                np.sin(theta_rad)]).astype(dtype)
+    n_steps, n_cols = series_x.shape
+    # rotated values and their absolute values, per (step, column) cell
+    n_cells = max(int(max_bytes) // (2 * dtype.itemsize * len(angles)), 1)
+    chunk_cols = min(n_cols, max(n_cells // n_steps, 1))
+    chunk_steps = min(n_steps, max(n_cells // chunk_cols, 1))
+    peaks = np.zeros([len(angles), n_cols], dtype=float)
+    for start in range(0, n_cols, chunk_cols):
+        cols = slice(start, start + chunk_cols)
+        for step in range(0, n_steps, chunk_steps):
+            steps = slice(step, step + chunk_steps)
+            # (columns x 2 x steps) component pairs
+            pairs = np.stack([series_x[steps, cols].T,
+                              series_y[steps, cols].T], axis=1)
+            rotated = np.fabs(np.matmul(rotation, pairs))
+            np.maximum(peaks[:, cols], np.max(rotated, axis=2).T,
+                       out=peaks[:, cols])
+    return peaks
+
+
+def _resultant_peaks(series_x, series_y, max_bytes=ROTATION_BLOCK_BYTES):
+    """
+    Returns the peak over time of the resultant |(x(t), y(t))| of two
+    series, i.e. their peak over all rotation angles, and the angle of the
+    direction in which it occurs
+    :param numpy.ndarray series_x:
+        (steps x columns) time series of the x-component
+    :param numpy.ndarray series_y:
+        (steps x columns) time series of the y-component
+    :returns:
+        peaks - Peak resultant of each column
+        angles - Angle of the peak (degrees, 0 - 180) of each column
+    """
+    series_x = np.reshape(series_x, (len(series_x), -1))
+    series_y = np.reshape(series_y, (len(series_y), -1))
+    n_steps, n_cols = series_x.shape
+    chunk_steps = min(n_steps, max(int(max_bytes) // (8 * n_cols), 1))
+    peak2 = np.zeros(n_cols, dtype=float)
+    peak_x, peak_y = np.zeros(n_cols), np.zeros(n_cols)
+    cols = np.arange(n_cols)
+    for step in range(0, n_steps, chunk_steps):
+        block_x = series_x[step:step + chunk_steps]
+        block_y = series_y[step:step + chunk_steps]
+        resultant2 = block_x ** 2. + block_y ** 2.
+        iloc = np.argmax(resultant2, axis=0)
+        larger = resultant2[iloc, cols] > peak2
+        peak2[larger] = resultant2[iloc, cols][larger]
+        peak_x[larger] = block_x[iloc, cols][larger]
+        peak_y[larger] = block_y[iloc, cols][larger]
+    angles = np.degrees(np.arctan2(peak_y, peak_x)) % 180.
+    return np.sqrt(peak2), angles
+
+
+def _interpolated_peaks(series_x, series_y, angles, coarse_step,
+        max_bytes=ROTATION_BLOCK_BYTES):
+    """
+    Returns the peaks of the rotated series swept at a coarse step and
+    interpolated linearly (periodically over 180 degrees) to the angles,
+    with bounds on the interpolated values. The peak changes between two
+    angles by at most 2 R sin(|dtheta| / 2), where R is the peak of the
+    resultant, which bounds the interpolation error
+    :param numpy.ndarray angles:
+        Increasing rotation angles (degrees, 0 - 180)
+    :param float coarse_step:
+        Step (degrees) of the swept angles; the first angle in each interval
+        of this width is swept
+    :returns:
+        estimate, lower, upper - (angles x columns) interpolated peaks and
+        their bounds, equal at the swept angles
+    """
+    coarse = np.unique(np.floor(angles / coarse_step + 1E-9),
+                       return_index=True)[1]
+    coarse_angles = angles[coarse]
+    coarse_peaks = _rotated_peaks(series_x, series_y, coarse_angles,
+                                  max_bytes)
+    radius = _resultant_peaks(series_x, series_y, max_bytes)[0]
+    iloc = np.searchsorted(coarse_angles, angles, side="right") - 1
+    left = coarse_angles[iloc]
+    right = np.append(coarse_angles[1:], coarse_angles[0] + 180.)[iloc]
+    weight = (angles - left) / (right - left)
+    inext = (iloc + 1) % len(coarse)
+    estimate = (1. - weight)[:, np.newaxis] * coarse_peaks[iloc] +\
+        weight[:, np.newaxis] * coarse_peaks[inext]
+    error = (1. - weight) * 2. * np.sin(np.radians(angles - left) / 2.) +\
+        weight * 2. * np.sin(np.radians(right - angles) / 2.)
+    error = error[:, np.newaxis] * radius
+    lower = np.maximum(estimate - error, 0.)
+    lower[coarse] = estimate[coarse]
+    upper = estimate + error
+    upper[coarse] = estimate[coarse]
+    return estimate, lower, upper
+
+
+def _refine_percentile(estimate, lower, upper, percentile, evaluate):
+    """
+    Refines the percentile over angles of bounded per-angle values. As the
+    percentile is monotonic in each value, the percentiles of the lower and
+    upper bounds bracket it; the angles whose bounds overlap the bracket are
+    evaluated exactly, until no other angle can move it
+    :param numpy.ndarray estimate:
+        (angles x columns) estimated values
+    :param numpy.ndarray lower:
+        (angles x columns) lower bounds of the values
+    :param numpy.ndarray upper:
+        (angles x columns) upper bounds of the values
+    :param evaluate:
+        Function of (angle mask, column) returning the exact values
+    :returns:
+        values - (angles x columns) estimates, exact where evaluated
+        value - Percentile of each column
+        error - Bound on the error of each value
+    """
+    values, lower, upper = estimate.copy(), lower.copy(), upper.copy()
+    n_cols = values.shape[1]
+    value, error = np.zeros(n_cols), np.zeros(n_cols)
+    for col in range(n_cols):
+        while True:
+            low = np.percentile(lower[:, col], percentile)
+            high = np.percentile(upper[:, col], percentile)
+            refine = (upper[:, col] > lower[:, col]) &\
+                (upper[:, col] >= low) & (lower[:, col] <= high)
+            if not np.any(refine):
+                break
+            values[refine, col] = evaluate(refine, col)
+            lower[refine, col] = values[refine, col]
+            upper[refine, col] = values[refine, col]
+        value[col] = np.percentile(values[:, col], percentile)
+        error[col] = max(high - value[col], value[col] - low)
+    return values, value, error
+
+
+def _adaptive_peaks(series_x, series_y, angles, percentile, coarse_step,
+        max_bytes=ROTATION_BLOCK_BYTES):
+    """
+    Returns the peaks of the rotated series and their percentile over the
+    angles, sweeping at a coarse step and evaluating exactly only the angles
+    that can move the percentile
+    :returns:
+        peaks - (angles x columns) peaks, interpolated where not evaluated
+        value - Percentile of each column
+        error - Bound on the error of each value
+    """
+    series_x = np.reshape(series_x, (len(series_x), -1))
+    series_y = np.reshape(series_y, (len(series_y), -1))
+    estimate, lower, upper = _interpolated_peaks(series_x, series_y, angles,
+                                                 coarse_step, max_bytes)
+
+    def evaluate(refine, col):
+        return _rotated_peaks(series_x[:, col], series_y[:, col],
+                              angles[refine], max_bytes)[:, 0]
+    return _refine_percentile(estimate, lower, upper, percentile, evaluate)
+
+
 def rotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
-        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings"):
+        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings",
+        max_bytes=ROTATION_BLOCK_BYTES, resultant=True, angle_step=1.,
+        adaptive=False, coarse_step=5., dtype=np.float64):
     """
     Returns the rotationally dependent spectrum RotDpp as defined by Boore
     (2010)
+
+    As the oscillators are linear, the response to the record rotated to an
+    angle is the same rotation of the responses to the two components, so
+    each component is integrated once and only the responses are rotated
+    :param int max_bytes:
+        Memory ceiling of the blocks of rotated responses
+    :param bool resultant:
+        For percentile 100, take RotD100 as the exact peak of the resultant
+        of the two oscillator responses instead of sweeping the angles; the
+        per-angle outputs are then None
+    :param float angle_step:
+        Step (degrees) of the rotation angles
+    :param bool adaptive:
+        Sweep the angles at coarse_step only, and rotate to the other angles
+        only where they can move the percentile. The per-angle outputs are
+        then interpolated where not evaluated
+    :param float coarse_step:
+        Step (degrees) of the coarse sweep of the adaptive mode
+    :param dtype:
+        Floating point type of the oscillator responses (see
+        get_response_spectrum)
+    :returns:
+        output - Dictionary of the RotDpp spectrum and the "Angle" (degrees)
+                 of the maximum response of each oscillator; in adaptive mode
+                 also the "Error", the bound on the relative error of the
+                 spectral ordinates against the full sweep
+        max_a_theta, max_v_theta, max_d_theta - (angles x 1 + periods) peak
+                 (PGA/PGV/PGD then spectral) responses at each angle
+        theta_set - Angles (degrees)
+    """
+    if np.fabs(time_step_x - time_step_y) > 1E-10:
+        raise ValueError("Record pair must have the same time-step!")
+    acceleration_x, acceleration_y = equalise_series(acceleration_x,
+                                                     acceleration_y)
+    theta_set = np.arange(0., 180., angle_step)
+    _, series_x, _, _, disp_x = get_response_spectrum(
+        acceleration_x, time_step_x, periods, damping, units, method,
+        dtype=dtype)
+    _, series_y, _, _, disp_y = get_response_spectrum(
+        acceleration_y, time_step_y, periods, damping, units, method,
+        dtype=dtype)
+    omega = (2. * np.pi) / np.asarray(periods)
+    if resultant and percentile >= 100.:
+        max_disp, angles = _resultant_peaks(disp_x, disp_y, max_bytes)
+        output = {"Pseudo-Acceleration": (omega ** 2.) * max_disp,
+                  "Pseudo-Velocity": omega * max_disp,
+                  "Displacement": max_disp,
+                  "Angle": angles}
+        for key, ground in (("PGA", "Acceleration"), ("PGV", "Velocity"),
+                            ("PGD", "Displacement")):
+            output[key] = _resultant_peaks(series_x[ground],
+                                           series_y[ground], max_bytes)[0][0]
+        return output, None, None, None, None
+    max_a_theta = np.zeros((len(theta_set), len(periods) + 1), dtype=np.float32)
+    max_v_theta = np.zeros_like(max_a_theta)
+    max_d_theta = np.zeros_like(max_a_theta)
+    ground = {}
+    for max_theta, key in zip((max_a_theta, max_v_theta, max_d_theta),
+                              ("Acceleration", "Velocity", "Displacement")):
+        if adaptive:
+            peaks, ground[key], _ = _adaptive_peaks(
+                series_x[key], series_y[key], theta_set, percentile,
+                coarse_step, max_bytes)
+        else:
+            peaks = _rotated_peaks(series_x[key], series_y[key], theta_set,
+                                   max_bytes)
+        max_theta[:, 0] = peaks[:, 0]
+    if adaptive:
+        max_disp, rotddpp, error = _adaptive_peaks(
+            disp_x, disp_y, theta_set, percentile, coarse_step, max_bytes)
+    else:
+        max_disp = _rotated_peaks(disp_x, disp_y, theta_set, max_bytes)
+    max_a_theta[:, 1:] = (omega ** 2.) * max_disp
+    max_v_theta[:, 1:] = omega * max_disp
+    max_d_theta[:, 1:] = max_disp
+    if adaptive:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            error = np.where(rotddpp > 0., error / rotddpp, 0.)
+        output = {"Pseudo-Acceleration": (omega ** 2.) * rotddpp,
+                  "Pseudo-Velocity": omega * rotddpp,
+                  "Displacement": rotddpp,
+                  "PGA": ground["Acceleration"][0],
+                  "PGV": ground["Velocity"][0],
+                  "PGD": ground["Displacement"][0],
+                  "Error": error}
+    else:
+        rotadpp = np.percentile(max_a_theta, percentile, axis=0)
+        rotvdpp = np.percentile(max_v_theta, percentile, axis=0)
+        rotddpp = np.percentile(max_d_theta, percentile, axis=0)
+        output = {"Pseudo-Acceleration": rotadpp[1:],
+                  "Pseudo-Velocity": rotvdpp[1:],
+                  "Displacement": rotddpp[1:],
+                  "PGA": rotadpp[0],
+                  "PGV": rotvdpp[0],
+                  "PGD": rotddpp[0]}
+    output["Angle"] = theta_set[np.argmax(max_disp, axis=0)]
+    return output, max_a_theta, max_v_theta, max_d_theta, theta_set
+
+def rotdpp_slow(acceleration_x, time_step_x, acceleration_y, time_step_y,
+        periods, percentile, damping=0.05, units="cm/s/s",
+        method="Nigam-Jennings"):
+    """
+    Returns the rotationally dependent spectrum RotDpp as defined by Boore
+    (2010). This "slow" version rotates the input acceleration and
+    integrates the oscillators again at each angle
+    Inputs as for rotdpp
     """
     if np.fabs(time_step_x - time_step_y) > 1E-10:
         raise ValueError("Record pair must have the same time-step!")
@@ -428,7 +926,7 @@ def rotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
         arot = acceleration_x * np.cos(theta_rad) +\
             acceleration_y * np.sin(theta_rad)
         saxy = get_response_spectrum(arot, time_step_x, periods, damping,
-            units, method)[0]
+            units, method, peaks_only=True, cache=None)[0]
         max_a_theta[iloc, 0] = saxy["PGA"]
         max_a_theta[iloc, 1:] = saxy["Pseudo-Acceleration"]
         max_v_theta[iloc, 0] = saxy["PGV"]
@@ -447,7 +945,9 @@ def rotdpp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
     return output, max_a_theta, max_v_theta, max_d_theta, theta_set
 
 def rotipp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
-        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings"):
+        percentile, damping=0.05, units="cm/s/s", method="Nigam-Jennings",
+        max_bytes=ROTATION_BLOCK_BYTES, angle_step=1., adaptive=False,
+        coarse_step=5.):
     """
     Returns the rotationally independent spectrum RotIpp as defined by
     Boore (2010)
@@ -459,15 +959,17 @@ def rotipp(acceleration_x, time_step_x, acceleration_y, time_step_y, periods,
     target, rota, rotv, rotd, angles = rotdpp(acceleration_x, time_step_x,
                                               acceleration_y, time_step_y,
                                               periods, percentile, damping,
-                                              units, method)
+                                              units, method, max_bytes,
+                                              resultant=False,
+                                              angle_step=angle_step,
+                                              adaptive=adaptive,
+                                              coarse_step=coarse_step)
     locn, penalty = _get_gmrotd_penalty(
         np.hstack([target["PGA"],target["Pseudo-Acceleration"]]),
         rota)
-    target_theta = np.radians(angles[locn])
-    arotpp = acceleration_x * np.cos(target_theta) +\
-        acceleration_y * np.sin(target_theta)
-    spec = get_response_spectrum(arotpp, time_step_x, periods, damping, units,
-        method)[0]
+    spec = rotated_response_spectrum(acceleration_x, time_step_x,
+                                     acceleration_y, time_step_y, periods,
+                                     angles[locn], damping, units, method)[0]
     spec["GMRot{:2.0f}".format(percentile)] = target
     return spec
 
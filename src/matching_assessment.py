@@ -16,42 +16,106 @@ import pandas as pd
 import multiprocessing as mp
 import matplotlib.pyplot as plt
 from matplotlib import ticker
-from scipy.stats.mstats import gmean
 from itertools import repeat
-from re import search
+import re
 
 import response_spectrum as rsp
 import intensity_measures as ims
+import spectrum_cache as sc
 from sm_utils import convert_accel_units as conv
+from geomean import nan_geomean
+
+# aliases of the two components of each kind of pair, as named groups
+# <trt>_H1/<trt>_H2 of one pattern so that each file name is matched once
+# bug alert: code proceeds if across pairs are defined in input_files
+# for example: if FN and H2 are defined instead of FN,FP or H1,H2
+# might be fixed if checked as tuple pairs
+COMPONENT_ALIASES = {
+    'ASC_H1': ['FN', 'Normal', 'H1', 'Hor1'],
+    'ASC_H2': ['FP', 'Parallel', 'H2', 'Hor2'],
+    'SZ_H1': ['SZ1'],
+    'SZ_H2': ['SZ2']}
+COMPONENT_PATTERN = re.compile('|'.join(
+    f"(?P<{group}>{'|'.join(map(re.escape, aliases))})"
+    for group, aliases in COMPONENT_ALIASES.items()))
+
+def _component_files(component_list):
+    """
+    Classifies the files of a record set by the component alias in their
+    names, in one pass.
 
-suite_list = []
+    Returns dict of the (H1, H2) component files of each kind of pair (ASC,
+    SZ) found among the files, with None for a missing component.
+    """
+    components = {}
+    # raise warning if file prefix is not the same with dir prefix
+    # check for multiple matches
+    for comp in component_list:
+        match = COMPONENT_PATTERN.search(comp)
+        if match is None:
+            continue
+        trt, component = match.lastgroup.split('_')
+        components.setdefault(trt, [None, None])[component == 'H2'] = comp
+    return {trt: tuple(files) for trt, files in components.items()}
 
-def _import_time_series(folder_acc_data):
+def _index_record(entry):
     """
-    Import Matched Acceleration Time-Series Data given directory containing the
-    record set.
+    Returns the index entry of a record set folder (os.DirEntry).
     """
-    try:
-        os.path.isdir(folder_acc_data)
-    except OSError:
-        print("Folder of acceleration time series records does not exist.")
-
-    H1_ALIASES = ['FN', 'Normal', 'H1', 'Hor1', 'SZ1']
-    H2_ALIASES = ['FP', 'Parallel', 'H2', 'Hor2', 'SZ2']
-
-    component_list = os.listdir(folder_acc_data)
+    components = _component_files(os.listdir(entry.path))
+    return {'name': entry.name, 'path': entry.path,
+            'components': components,
+            'trt': [trt for trt, files in components.items()
+                    if None not in files]}
 
-    # raise warning if file prefix is not the same with dir prefix
-    # inefficient search; improve with regex; check for multiple matches
-    for alias in H1_ALIASES:
-        for comp in component_list:
-            if alias in comp:
-                H1_file = comp
+def _index_target(target):
+    """
+    Returns the index entry of a target spectra file, with the damping ratio
+    and RotDnn percentile parsed from its name (None where not valid).
+    """
+    try:
+        damping = float(target[target.find('(') + 1:target.find('%')]) / 100
+    except ValueError:
+        damping = None
+    try:
+        percentile = float(target[target.lower().find('rotd') + 4:
+                                  target.lower().find('target')])
+    except ValueError:
+        percentile = None
+    return {'file': target, 'damping': damping, 'percentile': percentile}
 
-    for alias in H2_ALIASES:
-        for comp in component_list:
-            if alias in comp:
-                H2_file = comp
+def index_suite(suite_dir):
+    """
+    Scans a suite directory once and indexes its record sets and target
+    spectra files for all later stages.
+
+    Returns dict containing
+        'records' - record set folders (names starting with two digits),
+                    sorted by name, each a dict of its 'name', 'path', the
+                    (H1, H2) 'components' files of each kind of pair found
+                    (as _component_files) and the kinds with both ('trt')
+        'targets' - files named with 'target', each a dict of its 'file' name
+                    and the 'damping' ratio and RotDnn 'percentile' parsed
+                    from it
+    """
+    records, targets = [], []
+    with os.scandir(suite_dir) as entries:
+        for entry in entries:
+            # raise warning for duplicate prefixes?
+            if entry.name[:2].isdigit() and entry.is_dir():
+                records.append(_index_record(entry))
+            if 'target' in entry.name.lower():
+                targets.append(_index_target(entry.name))
+    records.sort(key=lambda record: record['name'])
+    return {'records': records, 'targets': targets}
+
+def _import_time_series(folder_acc_data, components):
+    """
+    Import Matched Acceleration Time-Series Data given directory containing the
+    record set and the names of its (H1, H2) component files, e.g. from the
+    suite index.
+    """
+    H1_file, H2_file = components
 
     H1_record = pd.read_csv(os.path.join(folder_acc_data, H1_file), delim_whitespace=True)
     H2_record = pd.read_csv(os.path.join(folder_acc_data, H2_file), delim_whitespace=True)
@@ -86,21 +150,17 @@ def _import_time_series(folder_acc_data):
     return H1_acc, H2_acc, time_step
 
 
-def import_ASC_target_spectra(suite_dir):
+def import_ASC_target_spectra(suite_dir, index=None):
     """
     Imports ASC Target Response Spectra from a file with words 'Target' and
-    'ASC' within suite directory.
+    'ASC' within suite directory, as listed in the suite index.
 
     Returns dict containing periods and spectral acceleration.
     """
-    try:
-        os.path.isdir(suite_dir)
-    except OSError:
-        print("Folder of ASC target spectra does not exist.")
-
-    component_list = os.listdir(suite_dir)
+    if index is None:
+        index = index_suite(suite_dir)
 
-    targets = [comp for comp in component_list if 'target' in comp.lower()]
+    targets = [target['file'] for target in index['targets']]
     if not targets:
         raise IndexError("Provide target spectra files!")
 
@@ -129,21 +189,17 @@ def import_ASC_target_spectra(suite_dir):
     return ASC_target
 
 
-def import_SZ_target_spectra(suite_dir):
+def import_SZ_target_spectra(suite_dir, index=None):
     """
     Imports SZ Target Response Spectra from a file with words 'Target' and
-    'SZ' within suite directory.
+    'SZ' within suite directory, as listed in the suite index.
 
     Returns dict containing periods and spectral acceleration.
     """
-    try:
-        os.path.isdir(suite_dir)
-    except OSError:
-        raise OSError("Folder of SZ target spectra does not exist.")
-
-    component_list = os.listdir(suite_dir)
+    if index is None:
+        index = index_suite(suite_dir)
 
-    targets = [comp for comp in component_list if 'target' in comp.lower()]
+    targets = [target['file'] for target in index['targets']]
     if not targets:
         raise IndexError("Provide target spectra files!")
 
@@ -171,28 +227,22 @@ def import_SZ_target_spectra(suite_dir):
 
     return SZ_target
 
-def detect_damping_ratio(suite_dir):
+def detect_damping_ratio(suite_dir, index=None):
     '''
     Extracts information on Damping from target spectra files
     '''
-    try:
-        os.path.isdir(suite_dir)
-    except OSError:
-        raise OSError('Folder of target spectra does not exist.')
+    if index is None:
+        index = index_suite(suite_dir)
 
-    component_list = os.listdir(suite_dir)
-
-    targets = [comp for comp in component_list if 'target' in comp.lower()]
+    targets = index['targets']
     if not targets:
         raise IndexError('Provide target spectra files!')
 
     damping = []
     for target in targets:
-        try:
-            damping.append(
-                float(target[target.find('(') + 1:target.find('%')]) / 100)
-        except ValueError:
+        if target['damping'] is None:
             raise ValueError('Input valid damping ratio value!')
+        damping.append(target['damping'])
 
     if len(set(damping)) != 1:
         raise ValueError('Damping ratios in target files are inconsistent!')
@@ -200,28 +250,22 @@ def detect_damping_ratio(suite_dir):
         print(f"Damping = {damping[0] * 100:.2f}%")
         return damping[0]
 
-def detect_percentile(suite_dir):
+def detect_percentile(suite_dir, index=None):
     '''
     Extracts information on percentile from target spectra files
     '''
-    try:
-        os.path.isdir(suite_dir)
-    except OSError:
-        raise OSError('Folder of target spectra does not exist.')
+    if index is None:
+        index = index_suite(suite_dir)
 
-    component_list = os.listdir(suite_dir)
-
-    targets = [comp for comp in component_list if 'target' in comp.lower()]
+    targets = index['targets']
     if not targets:
         raise IndexError('Provide target spectra files!')
-    
+
     percentile = []
     for target in targets:
-        try:
-            percentile.append(float(target[target.lower().find('rotd') + 4:
-                        target.lower().find('target')]))
-        except ValueError:
+        if target['percentile'] is None:
             raise ValueError('Input valid RotDnn value!')
+        percentile.append(target['percentile'])
 
     if len(set(percentile)) != 1:
         raise ValueError('Percentile in target files are inconsistent!')
@@ -229,133 +273,158 @@ def detect_percentile(suite_dir):
         print(f"Percentile = {percentile[0]:.0f}%")
         return percentile[0]
 
-def _record_rotdnn(record, suite_dir, ALIASES, periods, damping_level,
-                    percentile, suite_rotdnn):
+def _cached_spectrum(record, trt, cache_dir, compute, kind, periods,
+                     damping_level, percentile=None):
     '''
-    function for parallel processing of records in suite list
+    Returns the spectrum (g) of the trt pair of an indexed record set from
+    the spectrum cache, or computes it from the imported time series and
+    caches it
     '''
-    record_path = os.path.join(suite_dir, record)
-    # this can be removed once repetitive check is fixed
-    component_list = os.listdir(record_path)
-
-    matching_alias = [alias in comp for alias in ALIASES \
-                        for comp in component_list]
-
-    if not any(matching_alias):
-        # skip RotDnn computation if no ASC/SZ file names found in record dir
-        return
+    components = record['components'][trt]
+    if cache_dir is None:
+        return compute(*_import_time_series(record['path'], components))
+    component_files = [os.path.join(record['path'], comp)
+                       for comp in components]
+    key = sc.spectrum_key(component_files, kind, periods, damping_level,
+                          percentile)
+    spectrum = sc.load_spectrum(cache_dir, key)
+    if spectrum is None:
+        spectrum = compute(*_import_time_series(record['path'], components))
+        sc.save_spectrum(cache_dir, key, spectrum)
+    return spectrum
+
+def _has_record_pair(record, trt):
+    '''
+    Checks whether an indexed record set has a pair of component files named
+    with the aliases of the given kind of pair
+    '''
+    if trt in record['trt']:
+        return True
 
-    elif sum(matching_alias) == 1:
+    elif trt in record['components']:
         # Raise error message if only 1 matching name is found.
         raise ValueError(   f"No matching record pair found in "
-                            f"{os.path.abspath(record)}.")
-    # import corresponding time series from record set dir
-    record_acc_H1, record_acc_H2, dt = _import_time_series(record_path)
+                            f"{os.path.abspath(record['path'])}.")
+    return False
+
+def _record_rotdnn(record, trt, periods, damping_level, percentile,
+                    cache_dir=None):
+    '''
+    function for parallel processing of records in suite list; returns the
+    (record, RotDnn spectrum) pair
+    '''
+    def compute(record_acc_H1, record_acc_H2, dt):
+        # calculate RotDnn output dict for record, but result is in cgs units
+        RotDnn_cgs = ims.rotdpp(record_acc_H1, dt, record_acc_H2, dt,
+                                periods, percentile=percentile,
+                                damping=damping_level, units='g')[0]
+
+        # convert to g units
+        return conv(RotDnn_cgs["Pseudo-Acceleration"],
+                    from_='cm/s/s', to_='g')
 
-    # calculate RotDnn output dict for record, but result is in cgs units
-    RotDnn_cgs = ims.rotdpp(record_acc_H1, dt, record_acc_H2, dt,
-                            periods, percentile=percentile,
-                            damping=damping_level, units='g')[0]
+    # import corresponding time series from record set dir, unless cached
+    RotDnn_SA_g = _cached_spectrum(record, trt, cache_dir, compute, 'RotD',
+                                   periods, damping_level, percentile)
+    return record['name'], RotDnn_SA_g
 
-    # convert to g units
-    RotDnn_SA_g = conv(RotDnn_cgs["Pseudo-Acceleration"],
-                        from_='cm/s/s', to_='g')
-    # append to suite dict
-    suite_rotdnn[record] = RotDnn_SA_g
+def _rotdnn_task(task):
+    '''
+    Unpacks the arguments of _record_rotdnn for Pool.imap_unordered
+    '''
+    return _record_rotdnn(*task)
+
+def _record_geomean(record, periods, damping_level, cache_dir=None):
+    '''
+    function for parallel processing of records in suite list; returns the
+    (record, GeoMean spectrum) pair
+    '''
+    def compute(record_acc_H1, record_acc_H2, dt):
+        sax, say = ims.get_response_spectrum_pair(
+                        record_acc_H1, dt, record_acc_H2, dt,
+                        periods, damping=damping_level, units='g')
+
+        # calculate GeoMean spectra for record pair, but result is in cgs
+        # units
+        GM_SA_cgs = ims.geometric_mean_spectrum(sax, say)
+
+        # convert to g units
+        return conv(GM_SA_cgs["Pseudo-Acceleration"],
+                    from_='cm/s/s', to_='g')
+
+    # import corresponding time series from record set dir, unless cached
+    GM_SA_g = _cached_spectrum(record, 'SZ', cache_dir, compute, 'GeoMean',
+                               periods, damping_level)
+    return record['name'], GM_SA_g
+
+def _geomean_task(task):
+    '''
+    Unpacks the arguments of _record_geomean for Pool.imap_unordered
+    '''
+    return _record_geomean(*task)
+
+def _map_records(task, inputs, periods, pool=None):
+    '''
+    Runs the record tasks on the pool (or on a pool of their own) and
+    returns the suite dict of the periods and the spectra sorted by record
+    '''
+    if pool is None:
+        with mp.Pool() as pool:
+            suite = dict(pool.imap_unordered(task, inputs))
+    else:
+        suite = dict(pool.imap_unordered(task, inputs))
+
+    suite_sorted = {}
+    suite_sorted['Periods'] = periods
+    suite_sorted = {**suite_sorted, **dict(sorted(suite.items()))}
+    return suite_sorted
 
 def compute_suite_rotdnn_spectra(suite_dir, periods, trt,
-                                percentile, damping_level=0.05):
+                                percentile, damping_level=0.05,
+                                cache_dir=None, pool=None, index=None):
     """
     Calculate RotDnn Response Spectra for each record in a given suite of
-    acceleration time-histories from ASC/SZ regions.
+    acceleration time-histories from ASC/SZ regions, as listed in the suite
+    index. Spectra are reused from (and added to) the spectrum cache in
+    cache_dir, if given. The records are computed on the given
+    multiprocessing pool, shared across suites, or on a pool of their own.
     """
     print("Calculating " + trt + f" RotD{percentile:.0f}-component spectra...")
 
-    dir_list = os.listdir(suite_dir)
-    manager = mp.Manager()
-
-    # raise warning for duplicate prefixes?
-    # raise warning if file prefix is not the same with dir prefix
-    suite_list.extend([dir for dir in dir_list \
-                            if dir[:2].isdigit()])
-    # this is a repetitive check; revise later
-    # bug alert: code proceeds if across pairs are defined in input_files
-    # for example: if FN and H2 are defined instead of FN,FP or H1,H2
-    # might be fixed if checked as tuple pairs
-    if trt == 'ASC':
-        ALIASES = ['FN', 'Normal', 'H1', 'Hor1', 'FP', 'Parallel', 'H2', 'Hor2']
-    else:
-        ALIASES = ['SZ1', 'SZ2']
+    if index is None:
+        index = index_suite(suite_dir)
+    # skip RotDnn computation if no ASC/SZ file names found in record dir
+    suite_list = [record for record in index['records']
+                  if _has_record_pair(record, trt)]
     # calculate RotDnn spectra for each ASC/SZ record set in suite
-    suite_rotdnn = manager.dict()
-    suite_rotdnn['Periods'] = periods
     inputs = list(
-        zip(suite_list, repeat(suite_dir), repeat(ALIASES),
-            repeat(periods), repeat(damping_level), repeat(percentile),
-            repeat(suite_rotdnn)))
-    with mp.Pool() as pool:
-        pool.starmap(_record_rotdnn, inputs)
-
-    suite_rotdnn = dict(sorted(suite_rotdnn.items()))
-    suite_rotdnn_sorted = {}
-    suite_rotdnn_sorted['Periods'] = periods
-    suite_rotdnn_sorted = {**suite_rotdnn_sorted, **suite_rotdnn}
-    return suite_rotdnn_sorted
+        zip(suite_list, repeat(trt), repeat(periods), repeat(damping_level),
+            repeat(percentile), repeat(cache_dir)))
+    return _map_records(_rotdnn_task, inputs, periods, pool)
 
 
-def compute_suite_geomean_spectra(suite_dir, periods, damping_level=0.05):
+def compute_suite_geomean_spectra(suite_dir, periods, damping_level=0.05,
+                                  cache_dir=None, pool=None, index=None):
     """
     Calculate Geometric-Mean Acceleration Response Spectra for each record in a
-    given suite of acceleration time-histories from SZ (far-field) regions.
+    given suite of acceleration time-histories from SZ (far-field) regions, as
+    listed in the suite index. Spectra are reused from (and added to) the
+    spectrum cache in cache_dir, if given. The records are computed on the
+    given multiprocessing pool, or on a pool of their own.
     """
     print("Calculating GeoMean-component spectra...")
 
-    dir_list = os.listdir(suite_dir)
-
-    # raise warning for duplicate prefixes?
-    for i in np.arange(len(dir_list) + 1):
-        suite_list.extend([dir for dir in dir_list \
-                            if dir.startswith('{:0>2}'.format(i))])
-    # this is a repetitive check; revise later
-    SZ_ALIASES = ['SZ']
+    if index is None:
+        index = index_suite(suite_dir)
+    # skip GeoMean spectra computation if no SZ file names found in record
+    # set dir
+    suite_list = [record for record in index['records']
+                  if _has_record_pair(record, 'SZ')]
     # calculate Geometric-Mean spectra for each SZ record set in suite
-    suite_gm = {}
-    suite_gm['Periods'] = periods
-    for record in suite_list:
-        record_path = os.path.join(suite_dir, record)
-        # this can be removed once repetitive check is fixed
-        component_list = os.listdir(record_path)
-
-        matching_alias = [alias in comp for alias in SZ_ALIASES \
-                            for comp in component_list]
-
-        if not any(matching_alias):
-            # skip GeoMean spectra computation if no SZ file names found in
-            # record set dir
-            continue
-
-        elif sum(matching_alias) == 1:
-            # Raise error message if only 1 matching name is found.
-            raise ValueError(   f"No matching record pair found in "
-                                f"{os.path.abspath(record)}.")
-
-        # import corresponding time series from record set dir
-        record_acc_H1, record_acc_H2, dt = _import_time_series(record_path)
-        sax, say = ims.get_response_spectrum_pair(
-                        record_acc_H1, dt, record_acc_H2, dt,
-                        periods, damping=damping_level, units='g')
-
-        # calculate GeoMean spectra for record pair, but result is in cgs units
-        GM_SA_cgs = ims.geometric_mean_spectrum(sax, say)
-
-        # convert to g units
-        GM_SA_g = conv(GM_SA_cgs["Pseudo-Acceleration"],
-                        from_='cm/s/s', to_='g')
-
-        # append to suite dict
-        suite_gm[record] = GM_SA_g
-
-    return suite_gm
+    inputs = list(
+        zip(suite_list, repeat(periods), repeat(damping_level),
+            repeat(cache_dir)))
+    return _map_records(_geomean_task, inputs, periods, pool)
 
 
 # def get_NSCP2015_spectrum():
@@ -388,7 +457,7 @@ def plot_matching_assessment(save_dir, trt, target, suite,
                     )
         suite_periods = suite['Periods']
         # Calculate suite average
-        Average = gmean(list(suite[k] for k in suite.keys() \
+        Average = nan_geomean(list(suite[k] for k in suite.keys() \
                             if k != 'Periods'))
         ax.loglog(  suite_periods, Average, 'k-', linewidth=3,
                     label=trt + " Suite Average"
@@ -435,7 +504,7 @@ def plot_SZ_geomean(save_dir, SZ_target, SZ_suite,
         suite_periods = SZ_suite['Periods']
 
         # Calculate SZ suite average
-        SZ_Average = gmean(list(SZ_suite[k] for k in SZ_suite.keys() \
+        SZ_Average = nan_geomean(list(SZ_suite[k] for k in SZ_suite.keys() \
                             if k != 'Periods'))
         ax.loglog(suite_periods, SZ_Average,
                     'k-', linewidth=3, label="SZ Suite Average"
@@ -496,7 +565,7 @@ def save_data(save_dir, ASC_target, ASC_suite, SZ_target, SZ_suite,
 
     # Again, since I was forced to include Periods in dict
     if len(ASC_suite) > 1:
-        ASC_Average = gmean(list(ASC_suite[k] for k in ASC_suite.keys() \
+        ASC_Average = nan_geomean(list(ASC_suite[k] for k in ASC_suite.keys() \
                             if k != 'Periods'))
         df_ASC_suite['AVERAGE'] = ASC_Average
 
@@ -512,7 +581,7 @@ def save_data(save_dir, ASC_target, ASC_suite, SZ_target, SZ_suite,
 
     # Again, since I was forced to include Periods in dict
     if len(SZ_suite) > 1:
-        SZ_Average = gmean(list(SZ_suite[k] for k in SZ_suite.keys() \
+        SZ_Average = nan_geomean(list(SZ_suite[k] for k in SZ_suite.keys() \
                             if k != 'Periods'))
         df_SZ_suite['AVERAGE'] = SZ_Average
 
@@ -532,9 +601,11 @@ def main():
     # input_dir = '../data/input_files/NP21.069'
     # # -> default location for dist
     input_dir = os.path.join(os.getcwd(), "data", "input_files")
+    # one scan of the records and targets for all stages
+    index = index_suite(input_dir)
 
-    damping_ratio = detect_damping_ratio(input_dir)
-    percentile = detect_percentile(input_dir)
+    damping_ratio = detect_damping_ratio(input_dir, index)
+    percentile = detect_percentile(input_dir, index)
     periods = np.logspace(-2, 1, num=120)
     ## ####### ####### ##
 
@@ -543,26 +614,33 @@ def main():
     # # -> default location for dist
     output_dir = os.path.join(os.getcwd(), "data", "output_files")
     build_save_dir(output_dir)
+    # spectra of unchanged records are reused from previous runs
+    cache_dir = os.path.join(output_dir, sc.CACHE_DIR)
 
     # Get target response spectra in suite directory
-    ASC_target = import_ASC_target_spectra(input_dir)
-    SZ_target = import_SZ_target_spectra(input_dir)
-
-    # Get RotDnn-Component Response Spectra for ASC Suite
-    if ASC_target != {}:
-        suite_rotdnn_ASC = compute_suite_rotdnn_spectra(input_dir, periods, 
-                'ASC', percentile=percentile, damping_level=damping_ratio)
-    else: suite_rotdnn_ASC = {}
-
-    # Get RotDnn-Component Response Spectra for SZ Suite
-    if SZ_target != {}:
-        suite_rotdnn_SZ = compute_suite_rotdnn_spectra(input_dir, periods, 
-                'SZ', percentile=percentile, damping_level=damping_ratio)
-    else: suite_rotdnn_SZ = {}
-
-    # Get GeoMean-Component Response Spectra for SZ Suite
-    # suite_gm_spectra = compute_suite_geomean_spectra(input_dir, periods,
-    #                     damping_level=damping_ratio)
+    ASC_target = import_ASC_target_spectra(input_dir, index)
+    SZ_target = import_SZ_target_spectra(input_dir, index)
+
+    # one pool of workers for the ASC and SZ suites
+    with mp.Pool() as pool:
+        # Get RotDnn-Component Response Spectra for ASC Suite
+        if ASC_target != {}:
+            suite_rotdnn_ASC = compute_suite_rotdnn_spectra(input_dir, periods,
+                    'ASC', percentile=percentile, damping_level=damping_ratio,
+                    cache_dir=cache_dir, pool=pool, index=index)
+        else: suite_rotdnn_ASC = {}
+
+        # Get RotDnn-Component Response Spectra for SZ Suite
+        if SZ_target != {}:
+            suite_rotdnn_SZ = compute_suite_rotdnn_spectra(input_dir, periods,
+                    'SZ', percentile=percentile, damping_level=damping_ratio,
+                    cache_dir=cache_dir, pool=pool, index=index)
+        else: suite_rotdnn_SZ = {}
+
+        # Get GeoMean-Component Response Spectra for SZ Suite
+        # suite_gm_spectra = compute_suite_geomean_spectra(input_dir, periods,
+        #                 damping_level=damping_ratio, cache_dir=cache_dir,
+        #                 pool=pool, index=index)
 
     # Plot the output spectra - saved in an output dir
     plot_matching_assessment(output_dir, 'ASC', ASC_target, suite_rotdnn_ASC,
@@ -23,14 +23,22 @@ Obtained & modified from https://github.com/GEMScienceTools/gmpe-smtk
 Tools for calculating damped response spectra from ground motion time-histories
 '''
 
+import warnings
 import numpy as np
-from math import sqrt
 from scipy.integrate import cumtrapz
+from scipy.signal import lfilter
 import matplotlib.pyplot as plt
+import sdof_kernels as sk
 from sm_utils import (_save_image,
                       get_time_vector,
                       convert_accel_units,
-                      get_velocity_displacement)
+                      get_velocity_displacement,
+                      nextpow2)
+
+# Largest relative error of a reduced-precision spectrum against float64
+# tolerated by the self-check, and the number of periods it samples
+DTYPE_TOLERANCE = 1E-4
+DTYPE_CHECK_PERIODS = 3
 
 
 class ResponseSpectrum(object):
@@ -38,7 +46,8 @@ class ResponseSpectrum(object):
     Base Class to implement a response spectrum calculation
     '''
     def __init__(self, acceleration, time_step, periods, damping=0.05,
-            units="cm/s/s"):
+            units="cm/s/s", peaks_only=False, dtype=np.float64,
+            tolerance=DTYPE_TOLERANCE, check_periods=DTYPE_CHECK_PERIODS):
         '''
         Setup the response spectrum calculator
         :param numpy.ndarray time_hist:
@@ -49,6 +58,19 @@ class ResponseSpectrum(object):
             Fractional coefficient of damping
         :param str units:
             Units of the acceleration time history {"g", "m/s", "cm/s/s"}
+        :param bool peaks_only:
+            Track only the running peaks of the oscillator responses, in
+            O(num_periods) memory; the response time series are then
+            returned as None
+        :param dtype:
+            Floating point type of the oscillator responses; float32 halves
+            their memory traffic
+        :param float tolerance:
+            For a dtype other than float64, the spectrum at check_periods
+            periods is recomputed in float64 and a warning is issued if its
+            relative error exceeds the tolerance
+        :param int check_periods:
+            Number of periods checked against float64 (0 to skip the check)
 
         '''
         self.periods = periods
@@ -60,6 +82,10 @@ class ResponseSpectrum(object):
             self.d_t, self.acceleration)
         self.num_steps = len(self.acceleration)
         self.omega = (2. * np.pi) / self.periods
+        self.peaks_only = peaks_only
+        self.dtype = np.dtype(dtype)
+        self.tolerance = tolerance
+        self.check_periods = check_periods
         self.response_spectrum = None
 
 
@@ -92,6 +118,27 @@ class ResponseSpectrum(object):
         '''
         raise NotImplementedError("Cannot call Base Response Spectrum")
 
+    def _check_dtype(self):
+        '''
+        Recomputes the spectrum at a sample of the periods in float64 and
+        warns if the relative error of the computed spectrum exceeds the
+        tolerance
+        '''
+        if self.dtype == np.float64 or not self.check_periods:
+            return
+        periods = np.asarray(self.periods)
+        iloc = np.unique(np.linspace(0, self.num_per - 1,
+                                     self.check_periods).round().astype(int))
+        reference = type(self)(self.acceleration, self.d_t, periods[iloc],
+                               self.damping, peaks_only=True)()[0]
+        error = max(np.max(np.fabs(self.response_spectrum[key][iloc] -
+                                   reference[key]) / reference[key])
+                    for key in ('Acceleration', 'Velocity', 'Displacement'))
+        if not error <= self.tolerance:
+            warnings.warn(f"Response spectrum in {self.dtype} differs from "
+                          f"float64 by up to {error:.2e} (tolerance "
+                          f"{self.tolerance:.2e})")
+
 
 class NewmarkBeta(ResponseSpectrum):
     '''
@@ -124,21 +171,30 @@ class NewmarkBeta(ResponseSpectrum):
             accel - Acceleration response of Single Degree of Freedom Oscillator
             vel - Velocity response of Single Degree of Freedom Oscillator
             disp - Displacement response of Single Degree of Freedom Oscillator
+            (None if peaks_only)
         '''
         omega = (2. * np.pi) / self.periods
         cval = self.damping * 2. * omega
         kval = ((2. * np.pi) / self.periods) ** 2.
         # Perform Newmark - Beta integration
-        accel, vel, disp, a_t = self._newmark_beta(omega, cval, kval)
+        if self.peaks_only:
+            accel = vel = disp = None
+            peak_a, peak_v, peak_d = self._newmark_beta_peaks(cval, kval)
+        else:
+            accel, vel, disp, a_t = self._newmark_beta(omega, cval, kval)
+            peak_a = np.max(np.fabs(a_t), axis=0)
+            peak_v = np.max(np.fabs(vel), axis=0)
+            peak_d = np.max(np.fabs(disp), axis=0)
         self.response_spectrum = {
             'Period': self.periods,
-            'Acceleration': np.max(np.fabs(a_t), axis=0),
-            'Velocity': np.max(np.fabs(vel), axis=0),
-            'Displacement': np.max(np.fabs(disp), axis=0)}
+            'Acceleration': peak_a,
+            'Velocity': peak_v,
+            'Displacement': peak_d}
         self.response_spectrum['Pseudo-Velocity'] =  omega * \
             self.response_spectrum['Displacement']
         self.response_spectrum['Pseudo-Acceleration'] =  (omega ** 2.) * \
             self.response_spectrum['Displacement']
+        self._check_dtype()
         time_series = {
             'Time-Step': self.d_t,
             'Acceleration': self.acceleration,
@@ -152,7 +208,8 @@ class NewmarkBeta(ResponseSpectrum):
 
     def _newmark_beta(self, omega, cval, kval):
         '''
-        Newmark-beta integral
+        Newmark-beta integral; with numba, the compiled
+        sdof_kernels.newmark_beta_kernel is used
         :param numpy.ndarray omega:
             Angular period - (2 * pi) / T
         :param numpy.ndarray cval:
@@ -167,11 +224,22 @@ class NewmarkBeta(ResponseSpectrum):
             a_t - Acceleration response of a SDOF oscillator
 
         '''
+        if sk.NUMBA:
+            # (time x period) views of period-contiguous histories
+            accel, vel, disp, a_t = (
+                np.zeros([self.num_per, self.num_steps], dtype=self.dtype).T
+                for _ in range(4))
+            sk.newmark_beta_kernel(self.acceleration.astype(self.dtype),
+                                   self.dtype.type(self.d_t),
+                                   cval.astype(self.dtype),
+                                   kval.astype(self.dtype),
+                                   accel.T, vel.T, disp.T, a_t.T)
+            return accel, vel, disp, a_t
         # Pre-allocate arrays
-        accel = np.zeros([self.num_steps, self.num_per], dtype=float)
-        vel = np.zeros([self.num_steps, self.num_per], dtype=float)
-        disp = np.zeros([self.num_steps, self.num_per], dtype=float)
-        a_t = np.zeros([self.num_steps, self.num_per], dtype=float)
+        accel = np.zeros([self.num_steps, self.num_per], dtype=self.dtype)
+        vel = np.zeros([self.num_steps, self.num_per], dtype=self.dtype)
+        disp = np.zeros([self.num_steps, self.num_per], dtype=self.dtype)
+        a_t = np.zeros([self.num_steps, self.num_per], dtype=self.dtype)
         # Initial line
         accel[0, :] =(-self.acceleration[0] - (cval * vel[0, :])) - \
                       (kval * disp[0, :])
@@ -188,6 +256,40 @@ class NewmarkBeta(ResponseSpectrum):
             a_t[j, :] = self.acceleration[j] + accel[j, :]
         return accel, vel, disp, a_t
 
+    def _newmark_beta_peaks(self, cval, kval):
+        '''
+        Newmark-beta integral keeping only the current state and the running
+        peaks of the oscillators (compiled with numba, as _newmark_beta)
+        :returns:
+            Peak absolute acceleration, velocity and displacement responses
+        '''
+        acceleration = self.acceleration.astype(self.dtype)
+        cval, kval = cval.astype(self.dtype), kval.astype(self.dtype)
+        vel = np.zeros(self.num_per, dtype=self.dtype)
+        disp = np.zeros(self.num_per, dtype=self.dtype)
+        accel = -acceleration[0] * np.ones(self.num_per, dtype=self.dtype)
+        peak_a = np.fabs(accel + accel)
+        peak_v = np.zeros(self.num_per, dtype=self.dtype)
+        peak_d = np.zeros(self.num_per, dtype=self.dtype)
+        d_t = self.dtype.type(self.d_t)
+        denom = 1. / (1. + d_t * 0.5 * cval)
+        if sk.NUMBA:
+            peaks = np.empty([3, self.num_per], dtype=self.dtype)
+            sk.newmark_beta_peaks_kernel(acceleration, d_t, cval, kval,
+                                         denom, peaks)
+            return tuple(peaks)
+        for j in range(1, self.num_steps):
+            disp += (d_t * vel) + (((d_t ** 2.) / 2.) * accel)
+            accel_j = denom * (-acceleration[j] - kval * disp - cval *
+                (vel + (d_t * 0.5) * accel))
+            vel += d_t * (0.5 * accel + 0.5 * accel_j)
+            accel = accel_j
+            np.maximum(peak_a, np.fabs(acceleration[j] + accel),
+                       out=peak_a)
+            np.maximum(peak_v, np.fabs(vel), out=peak_v)
+            np.maximum(peak_d, np.fabs(disp), out=peak_d)
+        return peak_a, peak_v, peak_d
+
 
 class NigamJennings(ResponseSpectrum):
     """
@@ -203,33 +305,27 @@ class NigamJennings(ResponseSpectrum):
         Define the response spectrum
         """
         omega = (2. * np.pi) / self.periods
-        omega2 = omega ** 2.
-        omega3 = omega ** 3.
-        omega_d = omega * sqrt(1.0 - (self.damping ** 2.))
-        const = {'f1': (2.0 * self.damping) / (omega3 * self.d_t),
-                'f2': 1.0 / omega2,
-                'f3': self.damping * omega,
-                'f4': 1.0 / omega_d}
-        const['f5'] = const['f3'] * const['f4']
-        const['f6'] = 2.0 * const['f3']
-        const['e'] = np.exp(-const['f3'] * self.d_t)
-        const['s'] = np.sin(omega_d * self.d_t)
-        const['c'] = np.cos(omega_d * self.d_t)
-        const['g1'] = const['e'] * const['s']
-        const['g2'] = const['e'] * const['c']
-        const['h1'] = (omega_d * const['g2']) - (const['f3'] * const['g1'])
-        const['h2'] = (omega_d * const['g1']) + (const['f3'] * const['g2'])
-        x_a, x_v, x_d = self._get_time_series(const, omega2)
+        if self.peaks_only:
+            x_a = x_v = x_d = None
+            peak_a, peak_v, peak_d = nigam_jennings_block(
+                self.acceleration, self.d_t, omega, self.damping,
+                dtype=self.dtype)[0]
+        else:
+            x_a, x_v, x_d = self._get_time_series(omega)
+            peak_a = np.max(np.fabs(x_a), axis=0)
+            peak_v = np.max(np.fabs(x_v), axis=0)
+            peak_d = np.max(np.fabs(x_d), axis=0)
 
         self.response_spectrum = {
             'Period': self.periods,
-            'Acceleration': np.max(np.fabs(x_a), axis=0),
-            'Velocity': np.max(np.fabs(x_v), axis=0),
-            'Displacement': np.max(np.fabs(x_d), axis=0)}
+            'Acceleration': peak_a,
+            'Velocity': peak_v,
+            'Displacement': peak_d}
         self.response_spectrum['Pseudo-Velocity'] =  omega * \
             self.response_spectrum['Displacement']
         self.response_spectrum['Pseudo-Acceleration'] =  (omega ** 2.) * \
             self.response_spectrum['Displacement']
+        self._check_dtype()
         time_series = {
             'Time-Step': self.d_t,
             'Acceleration': self.acceleration,
@@ -241,43 +337,348 @@ class NigamJennings(ResponseSpectrum):
 
         return self.response_spectrum, time_series, x_a, x_v, x_d
 
-    def _get_time_series(self, const, omega2):
+    def _get_time_series(self, omega):
         """
         Calculates the acceleration, velocity and displacement time series for
         the SDOF oscillator
-        :param dict const:
-            Constants of the algorithm
-        :param np.ndarray omega2:
-            Square of the oscillator period
+        :param np.ndarray omega:
+            Angular frequencies of the oscillators
         :returns:
             x_a = Acceleration time series
             x_v = Velocity time series
             x_d = Displacement time series
         """
-        x_d = np.zeros([self.num_steps - 1, self.num_per], dtype=float)
-        x_v = np.zeros_like(x_d)
-        x_a = np.zeros_like(x_d)
-
-        for k in range(0, self.num_steps - 1):
-            yval = k - 1
-            dug = self.acceleration[k + 1] - self.acceleration[k]
-            z_1 = const['f2'] * dug
-            z_2 = const['f2'] * self.acceleration[k]
-            z_3 = const['f1'] * dug
-            z_4 = z_1 / self.d_t
-            if k == 0:
-                b_val = z_2 - z_3
-                a_val = (const['f5'] * b_val) + (const['f4'] * z_4)
-            else:
-                b_val = x_d[k - 1, :] + z_2 - z_3
-                a_val = (const['f4'] * x_v[k - 1, :]) +\
-                    (const['f5'] * b_val) + (const['f4'] * z_4)
-
-            x_d[k, :] = (a_val * const['g1']) + (b_val * const['g2']) +\
-                z_3 - z_2 - z_1
-            x_v[k, :] = (a_val * const['h1']) - (b_val * const['h2']) - z_4
-            x_a[k, :] = (-const['f6'] * x_v[k, :]) - (omega2 * x_d[k, :])
-        return x_a, x_v, x_d
+        _, histories = nigam_jennings_block(self.acceleration, self.d_t,
+                                            omega, self.damping,
+                                            histories=True, dtype=self.dtype)
+        return histories
+
+
+def nigam_jennings_constants(omega, damping, time_step):
+    """
+    Returns the constants of the Nigam & Jennings (1969) recurrence for a
+    block of oscillators, with the forcing terms of each step folded into
+    the state update
+        x_d' = a11 x_d + a12 x_v + pd ug[k] + qd (ug[k + 1] - ug[k])
+        x_v' = a21 x_d + a22 x_v + pv ug[k] + qv (ug[k + 1] - ug[k])
+    :param np.ndarray omega:
+        Angular frequencies, broadcastable against damping
+    :param damping:
+        Fractional coefficients of damping
+    """
+    omega = np.asarray(omega, dtype=float)
+    damping = np.asarray(damping, dtype=float)
+    omega_d = omega * np.sqrt(1.0 - (damping ** 2.))
+    f1 = (2.0 * damping) / ((omega ** 3.) * time_step)
+    f2 = 1.0 / (omega ** 2.)
+    f3 = damping * omega
+    f4 = 1.0 / omega_d
+    f5 = f3 * f4
+    e = np.exp(-f3 * time_step)
+    g1 = e * np.sin(omega_d * time_step)
+    g2 = e * np.cos(omega_d * time_step)
+    h1 = (omega_d * g2) - (f3 * g1)
+    h2 = (omega_d * g1) + (f3 * g2)
+    # a_val = f4 * x_v + f5 * b_val + f4 * z_4, b_val = x_d + z_2 - z_3
+    a_dug = f4 * f2 / time_step - f5 * f1
+    return {'a11': g1 * f5 + g2, 'a12': g1 * f4,
+            'a21': h1 * f5 - h2, 'a22': h1 * f4,
+            'pd': (g1 * f5 + g2 - 1.0) * f2,
+            'qd': g1 * a_dug - g2 * f1 + f1 - f2,
+            'pv': (h1 * f5 - h2) * f2,
+            'qv': h1 * a_dug + h2 * f1 - f2 / time_step,
+            'f6': 2.0 * f3,
+            'omega2': omega ** 2.}
+
+
+def nigam_jennings_block(acceleration, time_step, omega, damping,
+                         histories=False, dtype=np.float64):
+    """
+    Advances the Nigam & Jennings recurrence for a block of oscillators at
+    once, e.g. (periods x damping ratios), keeping the running peaks of the
+    responses in place rather than their full time series. With numba, the
+    compiled sdof_kernels.nigam_jennings_kernel is used
+    :param np.ndarray acceleration:
+        Acceleration time series (cm/s/s)
+    :param float time_step:
+        Time step (s)
+    :param np.ndarray omega:
+        Angular frequencies, broadcastable against damping
+    :param damping:
+        Fractional coefficients of damping
+    :param bool histories:
+        Also return the (time x block) responses
+    :param dtype:
+        Floating point type of the responses; the constants are computed in
+        float64 and rounded to it
+    :returns:
+        peaks - Tuple of the peak absolute acceleration, velocity and
+                displacement responses of the block
+        histories - Tuple of the acceleration, velocity and displacement
+                    time series if requested, else None
+    """
+    const = nigam_jennings_constants(omega, damping, time_step)
+    shape = np.broadcast(const['a11'], const['omega2']).shape
+    const = {key: np.broadcast_to(value, shape).astype(dtype)
+             for key, value in const.items()}
+    acceleration = np.asarray(acceleration, dtype=float)
+    dug = np.diff(acceleration).astype(dtype)
+    acceleration = acceleration.astype(dtype)
+    num_steps = len(dug)
+    if sk.NUMBA:
+        n_osc = int(np.prod(shape))
+        peaks = np.empty([3, n_osc], dtype)
+        series = np.empty([3, n_osc, num_steps if histories else 0], dtype)
+        sk.nigam_jennings_kernel(acceleration, dug, *(
+            const[key].ravel() for key in ('a11', 'a12', 'a21', 'a22', 'pd',
+                                           'qd', 'pv', 'qv', 'f6', 'omega2')),
+            peaks, series)
+        peaks = tuple(peak.reshape(shape) for peak in peaks)
+        if not histories:
+            return peaks, None
+        # (time x block) views of oscillator-contiguous histories
+        return peaks, tuple(np.moveaxis(history.reshape(shape + (num_steps,)),
+                                        -1, 0) for history in series)
+
+    x_d, x_v, x_a = (np.zeros(shape, dtype) for _ in range(3))
+    new_d, tmp = np.empty(shape, dtype), np.empty(shape, dtype)
+    peaks = tuple(np.zeros(shape, dtype) for _ in range(3))
+    if histories:
+        series = tuple(np.empty((num_steps,) + shape, dtype)
+                       for _ in range(3))
+    for k in range(num_steps):
+        np.multiply(const['a11'], x_d, out=new_d)
+        new_d += np.multiply(const['a12'], x_v, out=tmp)
+        new_d += np.multiply(const['pd'], acceleration[k], out=tmp)
+        new_d += np.multiply(const['qd'], dug[k], out=tmp)
+        x_v *= const['a22']
+        x_v += np.multiply(const['a21'], x_d, out=tmp)
+        x_v += np.multiply(const['pv'], acceleration[k], out=tmp)
+        x_v += np.multiply(const['qv'], dug[k], out=tmp)
+        x_d, new_d = new_d, x_d
+        np.multiply(const['f6'], x_v, out=x_a)
+        x_a += np.multiply(const['omega2'], x_d, out=tmp)
+        np.negative(x_a, out=x_a)
+        for peak, value in zip(peaks, (x_a, x_v, x_d)):
+            np.maximum(peak, np.fabs(value, out=tmp), out=peak)
+        if histories:
+            for history, value in zip(series, (x_a, x_v, x_d)):
+                history[k] = value
+    return peaks, series if histories else None
+
+
+def nigam_jennings_modes(omega, damping, time_step):
+    """
+    Returns the Nigam & Jennings recurrence of each oscillator decomposed on
+    its complex modes: the modal response q follows the first-order filter
+        q[k] = p q[k - 1] + c_1 ug[k + 1] + c_0 ug[k]
+    and the displacement and velocity responses are 2 Re(q) and 2 Re(s q).
+    The poles p = exp(s dt) are exact, so unlike the equivalent
+    second-order filter the recursion keeps its precision when the poles
+    approach 1 (long periods or short time steps)
+    :returns:
+        p - Poles of the modes
+        c_1, c_0 - Forcing coefficients of ug[k + 1] and ug[k]
+        s - Continuous-time eigenvalues -damping * omega + i * omega_d
+    """
+    const = nigam_jennings_constants(omega, damping, time_step)
+    omega = np.asarray(omega, dtype=float)
+    damping = np.asarray(damping, dtype=float)
+    omega_d = omega * np.sqrt(1.0 - (damping ** 2.))
+    eig = -damping * omega + 1j * omega_d
+    # first row of the inverse of the eigenvector matrix [[1, 1], [s, s*]]
+    c_1 = (np.conj(eig) * const['qd'] - const['qv']) / (-2j * omega_d)
+    c_0 = (np.conj(eig) * (const['pd'] - const['qd']) -
+           (const['pv'] - const['qv'])) / (-2j * omega_d)
+    return np.exp(eig * time_step), c_1, c_0, eig
+
+
+class RecursiveFilter(ResponseSpectrum):
+    """
+    Evaluates the response spectrum with the exact piecewise-linear solution
+    of Nigam & Jennings (1969) expressed as a recursive (IIR) digital filter
+    per period, each applied by a compiled scipy.signal.lfilter call
+    """
+
+    def __call__(self):
+        """
+        Define the response spectrum
+        """
+        omega = (2. * np.pi) / self.periods
+        poles, c_1, c_0, eig = nigam_jennings_modes(omega, self.damping,
+                                                    self.d_t)
+        f6 = 2.0 * self.damping * omega
+        # complex type of the modal responses for the dtype
+        ctype = np.result_type(self.dtype, np.complex64)
+        poles, c_1, c_0, eig = (value.astype(ctype)
+                                for value in (poles, c_1, c_0, eig))
+        f6, omega2 = f6.astype(self.dtype), (omega ** 2.).astype(self.dtype)
+        ug = self.acceleration[1:].astype(self.dtype)
+        if not self.peaks_only:
+            # (time x period) views of period-contiguous histories
+            x_a, x_v, x_d = (np.empty([self.num_per, self.num_steps - 1],
+                                      self.dtype).T for _ in range(3))
+        peak_a, peak_v, peak_d = (np.empty(self.num_per) for _ in range(3))
+        for iloc in range(self.num_per):
+            # ug[0] enters through the initial state of the filter
+            modal = lfilter(np.array([c_1[iloc], c_0[iloc]]),
+                            np.array([1., -poles[iloc]], ctype), ug,
+                            zi=[c_0[iloc] * ug.dtype.type(
+                                self.acceleration[0])])[0]
+            disp = 2. * modal.real
+            vel = 2. * (eig[iloc] * modal).real
+            accel = -f6[iloc] * vel - omega2[iloc] * disp
+            peak_a[iloc] = np.max(np.fabs(accel))
+            peak_v[iloc] = np.max(np.fabs(vel))
+            peak_d[iloc] = np.max(np.fabs(disp))
+            if not self.peaks_only:
+                x_a[:, iloc], x_v[:, iloc], x_d[:, iloc] = accel, vel, disp
+        if self.peaks_only:
+            x_a = x_v = x_d = None
+
+        self.response_spectrum = {
+            'Period': self.periods,
+            'Acceleration': peak_a,
+            'Velocity': peak_v,
+            'Displacement': peak_d}
+        self.response_spectrum['Pseudo-Velocity'] =  omega * \
+            self.response_spectrum['Displacement']
+        self.response_spectrum['Pseudo-Acceleration'] =  (omega ** 2.) * \
+            self.response_spectrum['Displacement']
+        self._check_dtype()
+        time_series = {
+            'Time-Step': self.d_t,
+            'Acceleration': self.acceleration,
+            'Velocity': self.velocity,
+            'Displacement': self.displacement,
+            'PGA': np.max(np.fabs(self.acceleration)),
+            'PGV': np.max(np.fabs(self.velocity)),
+            'PGD': np.max(np.fabs(self.displacement))}
+
+        return self.response_spectrum, time_series, x_a, x_v, x_d
+
+
+def nigam_jennings_spectra(acceleration, time_step, periods, damping=0.05,
+                           units="cm/s/s"):
+    """
+    Returns the response spectra of a record for several damping ratios from
+    one pass of the Nigam & Jennings recurrence over the (periods x damping)
+    block of oscillators
+    :param np.ndarray periods:
+        Spectral periods (s)
+    :param damping:
+        Fractional coefficient(s) of damping
+    :returns:
+        Dictionary of the 'Period', 'Damping' and (periods x damping)
+        'Acceleration', 'Velocity', 'Displacement', 'Pseudo-Velocity' and
+        'Pseudo-Acceleration' response spectra (cm, s)
+    """
+    acceleration = convert_accel_units(acceleration, units)
+    periods = np.asarray(periods, dtype=float)
+    damping = np.atleast_1d(np.asarray(damping, dtype=float))
+    omega = ((2. * np.pi) / periods)[:, np.newaxis]
+    (s_a, s_v, s_d), _ = nigam_jennings_block(acceleration, time_step,
+                                              omega, damping[np.newaxis, :])
+    return {'Period': periods,
+            'Damping': damping,
+            'Acceleration': s_a,
+            'Velocity': s_v,
+            'Displacement': s_d,
+            'Pseudo-Velocity': omega * s_d,
+            'Pseudo-Acceleration': (omega ** 2.) * s_d}
+
+
+def stack_records(accelerations):
+    """
+    Stacks acceleration records of different lengths into a zero-padded
+    (records x samples) array
+    :returns:
+        stack - Padded records
+        lengths - Number of samples of each record
+    """
+    lengths = np.array([len(acc) for acc in accelerations], dtype=int)
+    stack = np.zeros([len(accelerations), lengths.max()], dtype=float)
+    for iloc, acc in enumerate(accelerations):
+        stack[iloc, :lengths[iloc]] = acc
+    return stack, lengths
+
+
+def fft_response_spectra(accelerations, time_step, periods, damping=0.05,
+        units="cm/s/s", lengths=None, decay=1E-6):
+    """
+    Returns the response spectra of a suite of records sampled at a common
+    time step in one vectorized call, multiplying the spectrum of every
+    record by the transfer functions of the Nigam & Jennings oscillators in
+    the frequency domain. The records are zero-padded to the next power of
+    two beyond the time taken by the free vibration of the slowest oscillator
+    to decay, so the spectra agree with NigamJennings to the given decay
+    :param numpy.ndarray accelerations:
+        (records x samples) zero-padded acceleration time series, as
+        returned by stack_records
+    :param float time_step:
+        Time step of the records (s)
+    :param numpy.ndarray periods:
+        Spectral periods (s)
+    :param float damping:
+        Fractional coefficient of damping (> 0)
+    :param numpy.ndarray lengths:
+        Number of samples of each record; by default the full width
+    :param float decay:
+        Residual free vibration, relative to its start, wrapped around by
+        the circular convolution
+    :returns:
+        Dictionary of the 'Period', (records x periods) 'Acceleration',
+        'Velocity', 'Displacement', 'Pseudo-Velocity' and
+        'Pseudo-Acceleration' response spectra and the 'PGA' of each record
+    """
+    if damping <= 0.:
+        raise ValueError("Frequency-domain spectra require damping > 0!")
+    acc = convert_accel_units(np.atleast_2d(accelerations), units)
+    n_rec, n_samples = acc.shape
+    if lengths is None:
+        lengths = np.full(n_rec, n_samples, dtype=int)
+    periods = np.asarray(periods, dtype=float)
+    omega = (2. * np.pi) / periods
+    poles, c_1, c_0, eig = nigam_jennings_modes(omega, damping, time_step)
+
+    # padding of each oscillator; one FFT of the suite per padded length
+    n_decay = np.ceil(-np.log(decay) / (damping * omega * time_step))
+    n_ffts = np.array([nextpow2(n_samples + n_pad) for n_pad in n_decay])
+
+    s_a, s_v, s_d = (np.empty([n_rec, len(periods)]) for _ in range(3))
+    for n_fft in np.unique(n_ffts):
+        spectrum = np.fft.rfft(acc, n_fft, axis=1)
+        z_inv = np.exp(-2j * np.pi * np.arange(n_fft // 2 + 1) / n_fft)
+        steps = np.arange(n_fft)
+        # response k of the recurrence is sample k + 1 of the filtered record
+        valid = (steps >= 1) & (steps < lengths[:, np.newaxis])
+        for iloc in np.flatnonzero(n_ffts == n_fft):
+            modal = (c_1[iloc] + c_0[iloc] * z_inv) / \
+                (1. - poles[iloc] * z_inv)
+            modal_conj = (np.conj(c_1[iloc]) + np.conj(c_0[iloc]) * z_inv) / \
+                (1. - np.conj(poles[iloc]) * z_inv)
+            # filtering from rest also feeds ug[0] through c_1 at step 0
+            start = c_1[iloc] * np.exp(eig[iloc] * time_step * steps)
+            disp = np.fft.irfft(spectrum * (modal + modal_conj), n_fft,
+                                axis=1)
+            disp -= 2. * np.outer(acc[:, 0], start.real)
+            vel = np.fft.irfft(spectrum * (eig[iloc] * modal +
+                                           np.conj(eig[iloc]) * modal_conj),
+                               n_fft, axis=1)
+            vel -= 2. * np.outer(acc[:, 0], (eig[iloc] * start).real)
+            accel = -2. * damping * omega[iloc] * vel - \
+                (omega[iloc] ** 2.) * disp
+            s_a[:, iloc] = np.max(np.where(valid, np.fabs(accel), 0.), axis=1)
+            s_v[:, iloc] = np.max(np.where(valid, np.fabs(vel), 0.), axis=1)
+            s_d[:, iloc] = np.max(np.where(valid, np.fabs(disp), 0.), axis=1)
+
+    return {'Period': periods,
+            'Acceleration': s_a,
+            'Velocity': s_v,
+            'Displacement': s_d,
+            'Pseudo-Velocity': omega * s_d,
+            'Pseudo-Acceleration': (omega ** 2.) * s_d,
+            'PGA': np.max(np.fabs(acc), axis=1)}
 
 
 PLOT_TYPE = {"loglog": lambda ax, x, y : ax.loglog(x, y),
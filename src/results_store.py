@@ -0,0 +1,120 @@
+'''
+Binary results store for compiled DEEPSOIL results
+
+Each profile is kept as one uncompressed NPZ archive holding its per-motion
+spectra/profiles and means, next to a batch archive holding the
+(profile x column x period) cubes and the batch means. Archives are loaded
+lazily, one array at a time, so reruns and downstream steps read only what
+they use instead of parsing the Excel workbooks.
+'''
+
+import os
+import numpy as np
+from collections.abc import Mapping
+
+# Keys holding string labels rather than numeric arrays
+LABEL_KEYS = ('Profiles', 'Motions', 'Pairs')
+
+
+class StoreArchive(Mapping):
+    '''
+    Read-only, lazily loaded view of an archive in the results store
+    '''
+    def __init__(self, filename):
+        '''
+        :param str filename:
+            Path to the NPZ archive
+        '''
+        self.filename = filename
+        self._npz = np.load(filename)
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            value = self._npz[key]
+            if key in LABEL_KEYS:
+                value = value.tolist()
+            self._cache[key] = value
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._npz.files)
+
+    def __len__(self):
+        return len(self._npz.files)
+
+    def close(self):
+        self._npz.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _save_archive(filename, arrays):
+    '''
+    Writes the dictionary of arrays to an NPZ archive, replacing any previous
+    archive only once the new one is complete
+    '''
+    tmp_file = filename + '.tmp.npz'
+    np.savez(tmp_file, **{key: np.asarray(value)
+                          for key, value in arrays.items()})
+    os.replace(tmp_file, filename)
+
+
+def profile_archive(store_dir, profile):
+    '''
+    Returns the path to the archive of a profile
+    '''
+    return os.path.join(store_dir, profile + '.npz')
+
+
+def batch_archive(store_dir):
+    '''
+    Returns the path to the batch archive
+    '''
+    return os.path.join(store_dir, 'batch.npz')
+
+
+def save_profile(store_dir, profile, result):
+    '''
+    Stores the collated motions and means of a profile
+    :param str store_dir:
+        Directory of the results store
+    :param str profile:
+        Profile name (e.g. 'profile_1')
+    :param dict result:
+        Arrays of the profile as returned by the compile step
+    '''
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+    _save_archive(profile_archive(store_dir, profile), result)
+
+
+def save_batch(store_dir, batch):
+    '''
+    Stores the batch cubes and means
+    '''
+    if not os.path.exists(store_dir):
+        os.makedirs(store_dir)
+    _save_archive(batch_archive(store_dir), batch)
+
+
+def load_profile(store_dir, profile):
+    '''
+    Lazily loads the stored results of a profile
+    '''
+    return StoreArchive(profile_archive(store_dir, profile))
+
+
+def load_batch(store_dir):
+    '''
+    Lazily loads the stored batch results
+    '''
+    filename = batch_archive(store_dir)
+    if not os.path.exists(filename):
+        raise FileNotFoundError(f"No compiled results found in "
+                                f"{os.path.abspath(store_dir)}!")
+    return StoreArchive(filename)
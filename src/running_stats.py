@@ -0,0 +1,82 @@
+'''
+Running (streaming) statistics over a sequence of equally shaped arrays
+
+The accumulators are updated one array at a time and keep only per-cell
+state, so their memory does not grow with the number of arrays folded in.
+NaN cells are skipped and counted per cell.
+'''
+
+import numpy as np
+from geomean import log_values, from_log_sum
+
+
+class RunningLogMean(object):
+    '''
+    Running geometric mean, kept as per-cell sums of logarithms and counts
+    '''
+    def __init__(self, shape):
+        self.log_sum = np.zeros(shape, dtype=float)
+        self.count = np.zeros(shape, dtype=int)
+        self.negatives = np.zeros(shape, dtype=int)
+
+    def add(self, values):
+        logs, valid, negative = log_values(values)
+        self.log_sum += logs
+        self.count += valid
+        self.negatives += negative
+
+    def result(self):
+        '''
+        Returns the geometric mean; NaN where no value was valid or an odd
+        number were negative
+        '''
+        return from_log_sum(self.log_sum, self.count, self.negatives)
+
+
+class RunningMean(object):
+    '''
+    Running arithmetic mean, kept as per-cell sums and counts
+    '''
+    def __init__(self, shape):
+        self.total = np.zeros(shape, dtype=float)
+        self.count = np.zeros(shape, dtype=int)
+
+    def add(self, values):
+        valid = ~np.isnan(values)
+        self.total += np.where(valid, values, 0.)
+        self.count += valid
+
+    def result(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count > 0, self.total / self.count, np.nan)
+
+
+class Reservoir(object):
+    '''
+    Uniform random sample of fixed size of the arrays seen so far (Vitter's
+    algorithm R), used to estimate percentiles in constant memory. Percentiles
+    are exact while no more arrays than the reservoir size were added.
+    '''
+    def __init__(self, shape, size=1000, seed=None):
+        self.size = size
+        self.samples = np.full((size,) + tuple(np.atleast_1d(shape)), np.nan)
+        self.n_seen = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, values):
+        self.n_seen += 1
+        if self.n_seen <= self.size:
+            self.samples[self.n_seen - 1] = values
+        else:
+            iloc = self._rng.integers(0, self.n_seen)
+            if iloc < self.size:
+                self.samples[iloc] = values
+
+    def percentile(self, q):
+        '''
+        Returns the per-cell percentiles q (0 - 100) of the sample, along a
+        new leading axis
+        '''
+        n_kept = min(self.n_seen, self.size)
+        return np.nanpercentile(self.samples[:n_kept], np.atleast_1d(q),
+                                axis=0)
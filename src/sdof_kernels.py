@@ -0,0 +1,163 @@
+'''
+Optional compiled kernels of the oscillator recurrences
+
+The time-stepping recurrences of the Newmark-Beta and Nigam & Jennings
+integrations cannot be vectorized along time, so with numba each oscillator
+is advanced by a compiled loop, in parallel over the oscillators, with the
+same operations as the NumPy implementations of response_spectrum; in float64
+they agree to rounding. In float32 the compiled results are not identical to
+the NumPy ones, since numba evaluates the float literals of the recurrences
+(e.g. 0.5) in float64. The kernels are compiled on first use and cached to
+disk.
+Without numba they are left as plain Python functions and NUMBA is False, so
+that response_spectrum keeps its NumPy implementations.
+
+The responses are written in place to (oscillator x time) arrays, so that
+each oscillator advances through contiguous memory.
+'''
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+NUMBA = numba is not None
+
+prange = numba.prange if NUMBA else range
+
+
+def _jit(function):
+    '''
+    Compiles the kernel, parallel over its prange loop and cached to disk,
+    if numba is available
+    '''
+    if not NUMBA:
+        return function
+    return numba.njit(parallel=True, cache=True)(function)
+
+
+def _inline(function):
+    '''
+    Compiles a scalar helper of the kernels, if numba is available
+    '''
+    if not NUMBA:
+        return function
+    return numba.njit(inline='always')(function)
+
+
+@_inline
+def _maximum(peak, value):
+    '''
+    Larger of the running peak and a value, propagating NaN as numpy.maximum
+    '''
+    if value > peak or value != value:
+        return value
+    return peak
+
+
+@_jit
+def newmark_beta_kernel(acceleration, d_t, cval, kval, accel, vel, disp,
+                        a_t):
+    '''
+    Newmark-beta integral, as response_spectrum.NewmarkBeta._newmark_beta
+    :param numpy.ndarray acceleration:
+        Acceleration time series
+    :param d_t:
+        Time step, of the type of the responses
+    :param numpy.ndarray cval:
+        Damping * 2 * omega of each oscillator
+    :param numpy.ndarray kval:
+        omega ** 2 of each oscillator
+    :param numpy.ndarray accel, vel, disp, a_t:
+        (oscillator x time) zeroed relative acceleration, velocity,
+        displacement and absolute acceleration responses, filled in place
+    '''
+    num_steps = acceleration.shape[0]
+    for i in prange(cval.shape[0]):
+        accel[i, 0] = (-acceleration[0] - (cval[i] * vel[i, 0])) - \
+            (kval[i] * disp[i, 0])
+        a_t[i, 0] = accel[i, 0] + accel[i, 0]
+        for j in range(1, num_steps):
+            disp[i, j] = disp[i, j - 1] + (d_t * vel[i, j - 1]) + \
+                (((d_t ** 2.) / 2.) * accel[i, j - 1])
+            accel[i, j] = (1. / (1. + d_t * 0.5 * cval[i])) * \
+                (-acceleration[j] - kval[i] * disp[i, j] - cval[i] *
+                 (vel[i, j - 1] + (d_t * 0.5) * accel[i, j - 1]))
+            vel[i, j] = vel[i, j - 1] + d_t * (0.5 * accel[i, j - 1] +
+                                               0.5 * accel[i, j])
+            a_t[i, j] = acceleration[j] + accel[i, j]
+
+
+@_jit
+def newmark_beta_peaks_kernel(acceleration, d_t, cval, kval, denom, peaks):
+    '''
+    Newmark-beta integral keeping only the running peaks, as
+    response_spectrum.NewmarkBeta._newmark_beta_peaks
+    :param numpy.ndarray denom:
+        1 / (1 + d_t * 0.5 * cval) of each oscillator
+    :param numpy.ndarray peaks:
+        (3 x oscillator) peak absolute acceleration, velocity and
+        displacement responses, filled in place
+    '''
+    num_steps = acceleration.shape[0]
+    for i in prange(cval.shape[0]):
+        vel = disp = acceleration[0] * 0.
+        accel = -acceleration[0]
+        peak_a = abs(accel + accel)
+        peak_v = peak_d = vel
+        for j in range(1, num_steps):
+            disp += (d_t * vel) + (((d_t ** 2.) / 2.) * accel)
+            accel_j = denom[i] * (-acceleration[j] - kval[i] * disp -
+                                  cval[i] * (vel + (d_t * 0.5) * accel))
+            vel += d_t * (0.5 * accel + 0.5 * accel_j)
+            accel = accel_j
+            peak_a = _maximum(peak_a, abs(acceleration[j] + accel))
+            peak_v = _maximum(peak_v, abs(vel))
+            peak_d = _maximum(peak_d, abs(disp))
+        peaks[0, i] = peak_a
+        peaks[1, i] = peak_v
+        peaks[2, i] = peak_d
+
+
+@_jit
+def nigam_jennings_kernel(acceleration, dug, a11, a12, a21, a22, pd, qd, pv,
+                          qv, f6, omega2, peaks, series):
+    '''
+    Nigam & Jennings recurrence, as response_spectrum.nigam_jennings_block
+    :param numpy.ndarray acceleration:
+        Acceleration time series
+    :param numpy.ndarray dug:
+        Increments of the acceleration time series
+    :param numpy.ndarray a11 ... omega2:
+        Constants of each oscillator (see
+        response_spectrum.nigam_jennings_constants)
+    :param numpy.ndarray peaks:
+        (3 x oscillator) peak absolute acceleration, velocity and
+        displacement responses, filled in place
+    :param numpy.ndarray series:
+        (3 x oscillator x time) acceleration, velocity and displacement
+        responses filled in place, or an empty (3 x oscillator x 0) array to
+        skip them
+    '''
+    num_steps = dug.shape[0]
+    keep = series.shape[2] > 0
+    for i in prange(a11.shape[0]):
+        x_d = x_v = a11[i] * 0.
+        peak_a = peak_v = peak_d = x_d
+        for k in range(num_steps):
+            new_d = a11[i] * x_d + a12[i] * x_v + pd[i] * acceleration[k] + \
+                qd[i] * dug[k]
+            x_v = x_v * a22[i] + a21[i] * x_d + pv[i] * acceleration[k] + \
+                qv[i] * dug[k]
+            x_d = new_d
+            x_a = -(f6[i] * x_v + omega2[i] * x_d)
+            peak_a = _maximum(peak_a, abs(x_a))
+            peak_v = _maximum(peak_v, abs(x_v))
+            peak_d = _maximum(peak_d, abs(x_d))
+            if keep:
+                series[0, i, k] = x_a
+                series[1, i, k] = x_v
+                series[2, i, k] = x_d
+        peaks[0, i] = peak_a
+        peaks[1, i] = peak_v
+        peaks[2, i] = peak_d
@@ -0,0 +1,89 @@
+'''
+Content-addressed cache of the spectra of ground-motion records
+
+Each spectrum is stored in its own .npy file named by a key hashed from the
+content of the component files of the record and the parameters of the
+spectrum (kind, periods, damping, percentile, method and units). Reruns only
+compute the spectra of records whose files or parameters changed; editing a
+target spectrum or adding a record to the suite leaves the other keys as
+they were. Stale entries are never read, since their key is not produced
+again, and the cache directory can be deleted at any time.
+'''
+
+import os
+import hashlib
+import numpy as np
+
+CACHE_DIR = 'spectrum_cache'
+# Bump to invalidate the cached spectra when their computation changes
+CACHE_VERSION = 1
+
+
+def _hash_file(filename, block_size=1 << 20):
+    '''
+    Returns the SHA-1 digest of the content of a file
+    '''
+    sha1 = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def spectrum_key(component_files, kind, periods, damping, percentile=None,
+                 method='Nigam-Jennings', units='g'):
+    '''
+    Returns the key of the spectrum of a record
+    :param list component_files:
+        Paths to the component time series of the record, in order
+    :param str kind:
+        Kind of spectrum, e.g. 'RotD' or 'GeoMean'
+    :param numpy.ndarray periods:
+        Spectral periods (s)
+    :param float damping:
+        Fractional coefficient of damping
+    :param float percentile:
+        Percentile of the rotation angles, if any
+    '''
+    sha1 = hashlib.sha1()
+    for filename in component_files:
+        sha1.update(_hash_file(filename).encode())
+    sha1.update(np.asarray(periods, dtype=float).tobytes())
+    sha1.update(repr((CACHE_VERSION, kind, float(damping),
+                      None if percentile is None else float(percentile),
+                      method, units)).encode())
+    return sha1.hexdigest()
+
+
+def _cache_file(cache_dir, key):
+    '''
+    Returns the path of the cached spectrum of a key
+    '''
+    return os.path.join(cache_dir, key + '.npy')
+
+
+def load_spectrum(cache_dir, key):
+    '''
+    Returns the cached spectrum of a key, or None if not cached
+    '''
+    filename = _cache_file(cache_dir, key)
+    if not os.path.exists(filename):
+        return None
+    try:
+        return np.load(filename)
+    except (OSError, ValueError):
+        # unreadable (e.g. truncated) entries are computed again
+        return None
+
+
+def save_spectrum(cache_dir, key, spectrum):
+    '''
+    Caches the spectrum of a key, replacing the file atomically so that
+    concurrent workers never read a partial entry
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    filename = _cache_file(cache_dir, key)
+    tmp_file = f'{filename}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.save(f, np.asarray(spectrum))
+    os.replace(tmp_file, filename)
@@ -0,0 +1,9 @@
+'''
+The modules in src are run as flat scripts, so they are imported from there
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,44 @@
+'''
+Checks the log-space geometric means of geomean against the power of the
+product of the values that they replace
+'''
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from geomean import nan_geomean, nan_geomean_reduceat
+from running_stats import RunningLogMean
+
+INF = np.inf
+
+
+def _product_mean(values):
+    frame = pd.DataFrame(np.asarray(values, dtype=float).T)
+    return frame.prod(axis=1).pow(1. / frame.shape[1]).to_numpy()
+
+
+@pytest.mark.parametrize('values', [
+    [[2., 8.], [0.5, 4.]],
+    [[-INF], [2.]],
+    [[-INF], [-INF]],
+    [[-2.], [-8.]],
+    [[-2.], [8.]]])
+def test_nan_geomean_as_product(values):
+    np.testing.assert_allclose(nan_geomean(values), _product_mean(values))
+
+
+def test_diverged_ordinate():
+    assert np.isnan(nan_geomean([[-INF], [2.]]))[0]
+    assert nan_geomean([[-INF], [-INF]])[0] == INF
+
+
+def test_reduceat_and_running_mean():
+    values = np.array([[-INF, 2.], [2., 2.], [4., np.nan], [1., 8.]])
+    pairs = nan_geomean_reduceat(values, [0, 2])
+    np.testing.assert_allclose(pairs[0], [np.nan, 2.])
+    np.testing.assert_allclose(pairs[1], [2., 8.])
+    running = RunningLogMean(2)
+    for row in values:
+        running.add(row)
+    np.testing.assert_allclose(running.result(), nan_geomean(values))
@@ -0,0 +1,53 @@
+'''
+Checks the response cache of intensity_measures
+'''
+
+import numpy as np
+import pytest
+
+import intensity_measures as ims
+
+TIME_STEP = 0.01
+PERIODS = np.array([0.1, 0.5, 1.0, 2.0])
+
+
+@pytest.fixture
+def record_pair():
+    rng = np.random.default_rng(7)
+    return 100. * rng.standard_normal(400), 100. * rng.standard_normal(400)
+
+
+def test_cached_outputs_are_reused(record_pair):
+    cache = ims.ResponseCache()
+    spectrum = ims.get_response_spectrum(record_pair[0], TIME_STEP, PERIODS,
+                                         cache=cache)
+    cached = ims.get_response_spectrum(record_pair[0], TIME_STEP, PERIODS,
+                                       cache=cache)
+    assert cache.nbytes > 0
+    assert cached[2] is spectrum[2]
+    assert not cached[2].flags.writeable
+
+
+def test_oversize_outputs_are_returned_uncached(record_pair):
+    cache = ims.ResponseCache(max_bytes=1000)
+    expected = ims.get_response_spectrum(record_pair[0], TIME_STEP, PERIODS,
+                                         cache=None)
+    outputs = ims.get_response_spectrum(record_pair[0], TIME_STEP, PERIODS,
+                                        cache=cache)
+    assert cache.nbytes == 0
+    assert not outputs[2].flags.writeable
+    for key in ('Acceleration', 'Pseudo-Acceleration'):
+        np.testing.assert_array_equal(outputs[0][key], expected[0][key])
+    np.testing.assert_array_equal(outputs[3], expected[3])
+
+
+def test_rotdpp_with_oversize_outputs(record_pair, monkeypatch):
+    acc_x, acc_y = record_pair
+    ims.RESPONSE_CACHE.clear()
+    expected = ims.rotdpp(acc_x, TIME_STEP, acc_y, TIME_STEP, PERIODS, 50)[0]
+    ims.RESPONSE_CACHE.clear()
+    monkeypatch.setattr(ims.RESPONSE_CACHE, 'max_bytes', 1000)
+    rotd = ims.rotdpp(acc_x, TIME_STEP, acc_y, TIME_STEP, PERIODS, 50)[0]
+    assert ims.RESPONSE_CACHE.nbytes == 0
+    np.testing.assert_array_equal(rotd['Pseudo-Acceleration'],
+                                  expected['Pseudo-Acceleration'])
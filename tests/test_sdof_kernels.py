@@ -0,0 +1,88 @@
+'''
+Checks the kernels of sdof_kernels against the NumPy implementations of
+response_spectrum. Without numba, the kernels run as plain Python functions
+'''
+
+import numpy as np
+import pytest
+
+import response_spectrum as rsp
+import sdof_kernels as sk
+
+TIME_STEP = 0.01
+PERIODS = np.array([0.05, 0.2, 1.0, 3.0])
+DAMPING = 0.05
+
+
+@pytest.fixture
+def acceleration():
+    rng = np.random.default_rng(42)
+    return 100. * rng.standard_normal(300)
+
+
+def _newmark_beta(acceleration, peaks_only, use_kernels, monkeypatch):
+    monkeypatch.setattr(sk, 'NUMBA', use_kernels)
+    return rsp.NewmarkBeta(acceleration, TIME_STEP, PERIODS, DAMPING,
+                           peaks_only=peaks_only)()
+
+
+def _nigam_jennings_block(acceleration, use_kernels, monkeypatch):
+    monkeypatch.setattr(sk, 'NUMBA', use_kernels)
+    omega = (2. * np.pi) / PERIODS
+    return rsp.nigam_jennings_block(acceleration, TIME_STEP, omega[:, None],
+                                    np.array([0.02, 0.05]), histories=True)
+
+
+@pytest.mark.parametrize('peaks_only', [False, True])
+def test_newmark_beta_kernels(acceleration, peaks_only, monkeypatch):
+    spectrum, _, accel, vel, disp = _newmark_beta(acceleration, peaks_only,
+                                                  False, monkeypatch)
+    kernel_spectrum, _, kernel_accel, kernel_vel, kernel_disp = \
+        _newmark_beta(acceleration, peaks_only, True, monkeypatch)
+    for key in ('Acceleration', 'Velocity', 'Displacement'):
+        np.testing.assert_allclose(kernel_spectrum[key], spectrum[key],
+                                   rtol=1E-10)
+    if peaks_only:
+        assert kernel_accel is None and accel is None
+        return
+    for kernel_history, history in zip(
+            (kernel_accel, kernel_vel, kernel_disp), (accel, vel, disp)):
+        assert kernel_history.shape == history.shape
+        np.testing.assert_allclose(kernel_history, history, rtol=1E-10,
+                                   atol=1E-10)
+
+
+def test_nigam_jennings_kernel(acceleration, monkeypatch):
+    peaks, histories = _nigam_jennings_block(acceleration, False, monkeypatch)
+    kernel_peaks, kernel_histories = _nigam_jennings_block(acceleration, True,
+                                                           monkeypatch)
+    for kernel_peak, peak in zip(kernel_peaks, peaks):
+        assert kernel_peak.shape == peak.shape == (len(PERIODS), 2)
+        np.testing.assert_allclose(kernel_peak, peak, rtol=1E-10)
+    for kernel_history, history in zip(kernel_histories, histories):
+        assert kernel_history.shape == history.shape
+        np.testing.assert_allclose(kernel_history, history, rtol=1E-10,
+                                   atol=1E-10)
+
+
+def test_compiled_kernels(acceleration, monkeypatch):
+    numba = pytest.importorskip('numba')
+    assert sk.NUMBA
+    assert isinstance(sk.nigam_jennings_kernel,
+                      numba.core.registry.CPUDispatcher)
+    spectrum, _, accel, vel, disp = _newmark_beta(acceleration, False, False,
+                                                  monkeypatch)
+    kernel_outputs = _newmark_beta(acceleration, False, True, monkeypatch)
+    for key in ('Acceleration', 'Velocity', 'Displacement'):
+        np.testing.assert_allclose(kernel_outputs[0][key], spectrum[key],
+                                   rtol=1E-10)
+    for kernel_history, history in zip(kernel_outputs[2:], (accel, vel, disp)):
+        np.testing.assert_allclose(kernel_history, history, rtol=1E-10,
+                                   atol=1E-10)
+    peaks, histories = _nigam_jennings_block(acceleration, False, monkeypatch)
+    kernel_peaks, kernel_histories = _nigam_jennings_block(acceleration, True,
+                                                           monkeypatch)
+    for kernel_value, value in zip(kernel_peaks + kernel_histories,
+                                   peaks + histories):
+        np.testing.assert_allclose(kernel_value, value, rtol=1E-10,
+                                   atol=1E-10)